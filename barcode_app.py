@@ -1,6 +1,4 @@
 import os
-import time
-import pandas as pd
 import webbrowser
 from tkinter import (
     Tk,
@@ -13,14 +11,19 @@ from tkinter import (
     Checkbutton,
     Canvas,
     OptionMenu,
+    Entry,
 )
 from tkinter import ttk
-from barcode import Code128
-from barcode.writer import ImageWriter
-from reportlab.pdfgen import canvas as pdf_canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
 from PIL import Image, ImageTk
+from barcode_raster import render_barcode
+from label_renderer import label_types, barcode_options
+from job_cache import cached_render
+from sheet_raster import image_formats, page_image_path, render_sheets
+from row_index import parse_ranges, reprint_pdf
+from raw_print import PrintDispatcher, format_stats, parse_printer
+from print_ledger import LEDGER_PATH, PrintLedger, duplicate_policies, preflight
+from label_sources import DEFAULT_COLUMN, DEFAULT_QTY_COLUMN, input_filetypes, is_supported, iter_code_batches, first_code
+from serials import expand_spec, serial_code_batches
 
 try:
     from tkinterdnd2 import DND_FILES, TkinterDnD
@@ -30,132 +33,167 @@ except ImportError:
     BaseTk = Tk
     dragdrop_enabled = False
 
-# Label definitions
-label_types = {
-    "Avery 5160": (2.625 * inch, 1.0 * inch),
-    "Avery 5163": (4.0 * inch, 2.0 * inch)
-}
-PAGE_WIDTH, PAGE_HEIGHT = letter
-COLUMNS = 3
-ROWS = 10
-H_MARGIN = 0.15 * inch  # Reduced from 0.19
-V_MARGIN = 0.3 * inch   # Keep the same
-H_GAP = 0.20 * inch     # Reduced from 0.125
-#V_GAP = 0.0 * inch      # Adjust the row gap
 output_pdf = "avery_labels.pdf"
+reprint_pdf_path = "avery_labels_reprint.pdf"
+output_formats = ("PDF",) + tuple(fmt.upper() for fmt in image_formats)
 
 preview_image = None
+last_input_path = None  # Most recent file rendered, for reprints
+last_output_path = None  # Most recent printable output (PDF or TIFF)
+print_dispatcher = PrintDispatcher()  # Keeps printer connections open between sends
+
+def show_preview(code):
+    global preview_image
+    img = render_barcode(code, barcode_options(barcode_font_size_var.get(), show_text_var.get()))
+
+    # --- Scale barcode to fit within the preview canvas, maintaining aspect ratio ---
+    canvas_w, canvas_h = 300, 100
+    img_w, img_h = img.size
+    scale = min((canvas_w - 10) / img_w, (canvas_h - 10) / img_h)  # 5px margin
+    new_w = int(img_w * scale)
+    new_h = int(img_h * scale)
+    img = img.resize((new_w, new_h), Image.LANCZOS)
+
+    # Center the image in the canvas
+    x_offset = (canvas_w - new_w) // 2
+    y_offset = (canvas_h - new_h) // 2
+
+    preview_image = ImageTk.PhotoImage(img)
+    label_canvas.delete("all")
+    label_canvas.create_rectangle(0, 0, canvas_w, canvas_h, fill="white", outline="gray")
+    label_canvas.create_image(x_offset, y_offset, anchor="nw", image=preview_image)
+
+    img.close()
+
+def current_settings():
+    return {
+        "label_type": label_type.get(),
+        "font_size": int(barcode_font_size_var.get()),
+        "show_text": show_text_var.get(),
+        "show_guides": show_guides_var.get(),
+        "copies": int(copies_var.get()),
+        "text_layer": text_layer_var.get(),
+    }
+
+def write_labels(make_batches, source):
+    global last_output_path
+    settings = current_settings()
+    output_format = output_format_var.get().lower()
+    with PrintLedger(LEDGER_PATH) as ledger, ledger.job(source, settings) as job:
+        # Check against everything printed before and reserve the codes; raises on abort
+        make_batches, printed = preflight(ledger, job, make_batches, duplicates_var.get())
+        if output_format == "pdf":
+            output_path = output_pdf
+            total_labels, cache_hit = cached_render(make_batches, output_path, settings,
+                                                    force=force_regen_var.get(), on_page=job.record_page)
+        else:
+            output_path = os.path.splitext(output_pdf)[0] + f".{output_format}"
+            total_labels = render_sheets(make_batches(), output_path, image_format=output_format,
+                                         on_page=job.record_page, **settings)
+            cache_hit = False
+            if output_format == "png":
+                output_path = page_image_path(output_path, 1)  # Open the first page
+    last_output_path = output_path if output_format != "png" else None
+    skipped = (f" {len(printed)} already-printed codes skipped (their labels stay blank)."
+               if printed and duplicates_var.get() == "skip" else "")
+    if cache_hit:
+        status_var.set(f"✅ {total_labels} labels (cache hit: reused previous PDF).{skipped}")
+    else:
+        status_var.set(f"✅ {total_labels} labels generated.{skipped}")
+    link_label.config(text=f"📂 Open {output_format.upper()}", fg="#2196f3")
+    link_label.bind("<Button-1>", lambda e: webbrowser.open(output_path))
 
-def generate_pdf(csv_path, preview_only=False):
-    global preview_imagecs
+def generate_pdf(input_path, preview_only=False):
+    global last_input_path
     try:
-        df = pd.read_csv(csv_path)
-        if "code" not in df.columns:
-            status_var.set("❌ CSV must contain a 'code' column.")
-            return
-
-        label_w, label_h = label_types[label_type.get()]
-        show_text = show_text_var.get()
+        column = code_column_var.get().strip() or DEFAULT_COLUMN
 
         if preview_only:
-            code = str(df.iloc[0]["code"])
-            filename = "preview_barcode"
-            Code128(code, writer=ImageWriter()).save(filename, options={
-                "font_size": int(barcode_font_size_var.get()),
-                "font_path": "Calibri.ttf",
-                "module_height": 20
-            })
-            img = Image.open(f"{filename}.png")
-
-            # --- Scale barcode to fit within the preview canvas, maintaining aspect ratio ---
-            canvas_w, canvas_h = 300, 100
-            img_w, img_h = img.size
-            scale = min((canvas_w - 10) / img_w, (canvas_h - 10) / img_h)  # 5px margin
-            new_w = int(img_w * scale)
-            new_h = int(img_h * scale)
-            img = img.resize((new_w, new_h), Image.LANCZOS)
-
-            # Center the image in the canvas
-            x_offset = (canvas_w - new_w) // 2
-            y_offset = (canvas_h - new_h) // 2
-
-            preview_image = ImageTk.PhotoImage(img)
-            label_canvas.delete("all")
-            label_canvas.create_rectangle(0, 0, canvas_w, canvas_h, fill="white", outline="gray")
-            label_canvas.create_image(x_offset, y_offset, anchor="nw", image=preview_image)
-
-            img.close()
-            os.remove(f"{filename}.png")
+            code = first_code(input_path, column)
+            if code is None:
+                status_var.set("No data in file for preview.")
+                return
+            show_preview(code)
             return
 
-        total_labels = len(df)
-        c = pdf_canvas.Canvas(output_pdf, pagesize=letter)
-
-
-        # Calculate vertical spacing
-        usable_height = PAGE_HEIGHT - (2 * V_MARGIN)
-        total_label_height = ROWS * label_h
-        v_gap = (usable_height - total_label_height) / (ROWS - 1)
-
-        for idx, row in df.iterrows():
-            col = idx % COLUMNS
-            row_pos = (idx // COLUMNS) % ROWS
-            
-            # Generate the barcode image first
-            barcode_data = str(row["code"])
-            barcode_base = f"barcode_{idx}"
-            barcode_filename = f"{barcode_base}.png"
-            
-            # Generate barcode image with specified font size
-            Code128(barcode_data, writer=ImageWriter()).save(barcode_base, options={
-                "font_size": int(barcode_font_size_var.get()),
-                "font_path": "Calibri.ttf",
-                "module_height": 20
-            })
-            
-            # Calculate label position
-            label_w, label_h = label_types[label_type.get()]
-            x = H_MARGIN + col * (label_w + H_GAP)
-            y = PAGE_HEIGHT - V_MARGIN - (row_pos * (label_h + v_gap)) - label_h
-
-            if idx > 0 and idx % (COLUMNS * ROWS) == 0:
-                c.showPage()
-
-            # Calculate centered position with more padding
-            padding = 0.08 * inch  # Add padding around each barcode
-            barcode_width = label_w - (2 * padding)  # Reduce width by padding on both sides
-            barcode_height = label_h - (2 * padding)  # Reduce height by padding on both sides
-            x_centered = x + padding  # Add padding to left
-            y_centered = y + padding  # Add padding to bottom
-
-            # Draw the barcode with centered positioning and padding
-            c.drawImage(
-                barcode_filename,
-                x_centered,
-                y_centered,
-                width=barcode_width,
-                height=barcode_height
-            )
-            
-            # Draw label outline (grid)
-            c.saveState()
-            c.setStrokeColorRGB(0.8, 0.8, 0.8)  # Light gray color
-            c.setLineWidth(0.25)  # Thin line
-            c.rect(x, y, label_w, label_h)  # Draw rectangle around label area
-            c.restoreState()
-
-            os.remove(barcode_filename)
-
-        c.save()
-        status_var.set(f"✅ {total_labels} labels generated.")
-        link_label.config(text="📂 Open PDF", fg="#2196f3")
-        link_label.bind("<Button-1>", lambda e: webbrowser.open(output_pdf))
+        qty_column = qty_column_var.get().strip() or None
+        write_labels(lambda: iter_code_batches(input_path, column, qty_column=qty_column), input_path)
+        last_input_path = input_path
+
+    except Exception as e:
+        status_var.set(f"❌ Error: {str(e)}")
+
+def generate_range():
+    global last_input_path
+    spec = serial_spec_var.get().strip()
+    if not spec:
+        status_var.set("❌ Enter a serial range, e.g. V13802DE..V13802DI")
+        return
+    try:
+        status_var.set("Processing serial range...")
+        # Reprints index an input file; a range has none, so don't offer the last file's pages
+        last_input_path = None
+        write_labels(lambda: serial_code_batches(spec), spec)
+        status_var.set(status_var.get() + " (Reprints need a file input.)")
+        show_preview(next(expand_spec(spec)))
+    except Exception as e:
+        status_var.set(f"❌ Error: {str(e)}")
 
+def reprint_pages():
+    global last_output_path
+    if last_input_path is None:
+        status_var.set("❌ Generate labels from a file first, then reprint its pages.")
+        return
+    try:
+        column = code_column_var.get().strip() or DEFAULT_COLUMN
+        qty_column = qty_column_var.get().strip() or None
+        pages = parse_ranges(reprint_var.get())
+        if not pages:
+            status_var.set("❌ Enter the pages to reprint, e.g. 8413-8420")
+            return
+        settings = current_settings()
+        with PrintLedger(LEDGER_PATH) as ledger, ledger.job(last_input_path, settings, kind="reprint") as job:
+            # Repeat only what the original job printed, leaving its skipped slots empty
+            keep = ledger.original_labels(last_input_path)
+            total_labels = reprint_pdf(last_input_path, reprint_pdf_path, column, pages=pages, qty_column=qty_column,
+                                       keep=keep, on_page=job.record_page, **settings)
+        last_output_path = reprint_pdf_path
+        unchecked = " (Not in the ledger, so skipped labels are included.)" if keep is None else ""
+        status_var.set(f"✅ {total_labels} labels reprinted from {os.path.basename(last_input_path)}.{unchecked}")
+        link_label.config(text="📂 Open Reprint PDF", fg="#2196f3")
+        link_label.bind("<Button-1>", lambda e: webbrowser.open(reprint_pdf_path))
     except Exception as e:
         status_var.set(f"❌ Error: {str(e)}")
 
+def send_to_printer():
+    if last_output_path is None:
+        status_var.set("❌ Generate a PDF or TIFF first, then send it to the printer.")
+        return
+    try:
+        printer = parse_printer(printer_var.get())
+        if not printer[0]:
+            status_var.set("❌ Enter the printer address (host or host:port) in Settings.")
+            return
+        # Counters span the dispatcher's lifetime; judge this send against their current values
+        before = print_dispatcher.printer(*printer).stats()
+        print_dispatcher.submit(printer, last_output_path)
+        poll_printer(printer, before["jobs_sent"], before["jobs_failed"])
+    except Exception as e:
+        status_var.set(f"❌ Error: {str(e)}")
+
+def poll_printer(printer, sent_before, failed_before):
+    # The sender runs in a background thread; report its progress from the Tk loop
+    stats = print_dispatcher.printer(*printer).stats()
+    if stats["jobs_sent"] + stats["jobs_failed"] <= sent_before + failed_before:
+        status_var.set(f"🖨 Sending... {format_stats(stats)}")
+        root.after(500, poll_printer, printer, sent_before, failed_before)
+    elif stats["jobs_failed"] > failed_before:
+        status_var.set(f"❌ Could not reach the printer. {format_stats(stats)}")
+    else:
+        status_var.set(f"✅ Sent. {format_stats(stats)}")
+
 def select_file():
-    file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
+    file_path = filedialog.askopenfilename(filetypes=input_filetypes)
     if file_path:
         abs_path = os.path.abspath(file_path)  # 👈 Ensure absolute path
         status_var.set("Processing...")
@@ -170,22 +208,23 @@ def toggle_theme():
     hint_fg = "#cccccc" if dark else "#666666"
 
     root.configure(bg=bg)
-    for widget in [status, link_label, drop_label, preview_label, header]:
+    for widget in [status, link_label, drop_label, preview_label, header, range_label, reprint_label]:
         widget.configure(bg=bg, fg=fg)
     subheader.configure(bg=bg, fg=hint_fg)
     settings_tab.configure(bg=bg)
     generator_tab.configure(bg=bg)
+    range_frame.configure(bg=bg)
     label_canvas.configure(bg="white")
 
 def handle_drop(event):
     file_path = event.data.strip("{}")
-    if file_path.lower().endswith(".csv"):
+    if is_supported(file_path):
         abs_path = os.path.abspath(file_path)  # 👈 Ensure absolute path
         status_var.set("Processing dropped file...")
         generate_pdf(abs_path)
         generate_pdf(abs_path, preview_only=True)
     else:
-        status_var.set("❌ Only CSV files are supported.")
+        status_var.set("❌ Only CSV, Excel, Parquet or JSONL files are supported.")
 
 
 def on_drag_enter(event):
@@ -203,10 +242,21 @@ root.configure(bg="#f4f4f4")
 theme_var = BooleanVar()
 theme_var.set(False)
 show_text_var = BooleanVar(value=True)
+force_regen_var = BooleanVar(value=False)
+show_guides_var = BooleanVar(value=True)
+text_layer_var = BooleanVar(value=True)
 barcode_font_size_var = StringVar(value="14")  # default barcode font size
 label_type = StringVar(value="Avery 5160")
+output_format_var = StringVar(value="PDF")
+code_column_var = StringVar(value=DEFAULT_COLUMN)
+qty_column_var = StringVar(value=DEFAULT_QTY_COLUMN)
+copies_var = StringVar(value="1")
+serial_spec_var = StringVar()
+reprint_var = StringVar()
+printer_var = StringVar()
+duplicates_var = StringVar(value="abort")
 status_var = StringVar()
-status_var.set("Upload or drag a CSV with a 'code' column.")
+status_var.set("Upload or drag a CSV, Excel, Parquet or JSONL file with a 'code' column.")
 
 # === Notebook ===
 notebook = ttk.Notebook(root)
@@ -221,22 +271,37 @@ notebook.add(settings_tab, text="⚙️ Settings")
 header = Label(generator_tab, text="Barcode Label Generator", font=("Helvetica", 16, "bold"), bg="#f4f4f4")
 header.pack(pady=(15, 3))
 
-subheader = Label(generator_tab, text="CSV must include a 'code' column", font=("Helvetica", 10), bg="#f4f4f4", fg="#666")
+subheader = Label(generator_tab, text="File must include a 'code' column (see Settings)", font=("Helvetica", 10), bg="#f4f4f4", fg="#666")
 subheader.pack()
 
 frame = Frame(generator_tab, bg="#f4f4f4")
 frame.pack(pady=(10, 5))
 
-btn = Button(frame, text="📂 Choose CSV", font=("Helvetica", 11), command=select_file, bg="#4caf50", fg="white", padx=12, pady=6)
+btn = Button(frame, text="📂 Choose File", font=("Helvetica", 11), command=select_file, bg="#4caf50", fg="white", padx=12, pady=6)
 btn.grid(row=0, column=0, padx=5)
 
+range_frame = Frame(generator_tab, bg="#f4f4f4")
+range_frame.pack(pady=(5, 5))
+
+range_label = Label(range_frame, text="Serial range:", font=("Helvetica", 9), bg="#f4f4f4")
+range_label.grid(row=0, column=0, padx=(0, 5))
+Entry(range_frame, textvariable=serial_spec_var, width=30).grid(row=0, column=1)
+Button(range_frame, text="Generate", font=("Helvetica", 9), command=generate_range).grid(row=0, column=2, padx=5)
+
+reprint_label = Label(range_frame, text="Reprint pages:", font=("Helvetica", 9), bg="#f4f4f4")
+reprint_label.grid(row=1, column=0, padx=(0, 5), pady=(5, 0))
+Entry(range_frame, textvariable=reprint_var, width=30).grid(row=1, column=1, pady=(5, 0))
+Button(range_frame, text="Reprint", font=("Helvetica", 9), command=reprint_pages).grid(row=1, column=2, padx=5, pady=(5, 0))
+
+Button(range_frame, text="🖨 Send to Printer", font=("Helvetica", 9), command=send_to_printer).grid(row=2, column=1, pady=(5, 0))
+
 link_label = Label(generator_tab, text="", font=("Helvetica", 10, "underline"), bg="#f4f4f4", cursor="hand2")
 link_label.pack(pady=(5, 0))
 
 status = Label(generator_tab, textvariable=status_var, wraplength=400, bg="#f4f4f4", font=("Helvetica", 9), fg="#333")
 status.pack(pady=10)
 
-drop_label = Label(generator_tab, text="⬇️ Drop CSV file here", font=("Helvetica", 10, "italic"), bg="#e0e0e0", fg="#444", relief="groove", width=40, height=3, bd=2)
+drop_label = Label(generator_tab, text="⬇️ Drop CSV, Excel, Parquet or JSONL file here", font=("Helvetica", 10, "italic"), bg="#e0e0e0", fg="#444", relief="groove", width=40, height=3, bd=2)
 drop_label.pack(pady=(0, 10))
 
 if dragdrop_enabled:
@@ -254,11 +319,26 @@ label_canvas.pack(pady=(5, 20))
 # === Settings Tab ===
 Label(settings_tab, text="⚙️ Settings", font=("Helvetica", 14, "bold"), bg="#f4f4f4").pack(pady=(20, 5))
 Checkbutton(settings_tab, text="Show Text Below Barcode", variable=show_text_var, bg="#f4f4f4").pack(pady=5)
+Checkbutton(settings_tab, text="Searchable Text (PDF text instead of image)", variable=text_layer_var, bg="#f4f4f4").pack(pady=5)
+Checkbutton(settings_tab, text="Show Alignment Guides (label outlines)", variable=show_guides_var, bg="#f4f4f4").pack(pady=5)
+Checkbutton(settings_tab, text="Force Regenerate (ignore cached PDF)", variable=force_regen_var, bg="#f4f4f4").pack(pady=5)
 Label(settings_tab, text="Label Type:", bg="#f4f4f4").pack()
 OptionMenu(settings_tab, label_type, *label_types.keys()).pack(pady=5)
+Label(settings_tab, text="Output Format:", bg="#f4f4f4").pack()
+OptionMenu(settings_tab, output_format_var, *output_formats).pack(pady=5)
 Checkbutton(settings_tab, text="🌙 Dark Mode", variable=theme_var, command=toggle_theme, bg="#f4f4f4").pack(pady=(10, 20))
 Label(settings_tab, text="Barcode Font Size (under barcode)", bg="#f4f4f4").pack()
 OptionMenu(settings_tab, barcode_font_size_var, *[str(i) for i in range(6, 30)]).pack(pady=(0, 10))
+Label(settings_tab, text="Already-Printed Codes (from the print ledger)", bg="#f4f4f4").pack()
+OptionMenu(settings_tab, duplicates_var, *duplicate_policies).pack(pady=(0, 10))
+Label(settings_tab, text="Network Printer (host or host:port, raw port 9100)", bg="#f4f4f4").pack()
+Entry(settings_tab, textvariable=printer_var, width=20).pack(pady=(0, 10))
+Label(settings_tab, text="Code Column Name", bg="#f4f4f4").pack()
+Entry(settings_tab, textvariable=code_column_var, width=20).pack(pady=(0, 10))
+Label(settings_tab, text="Quantity Column Name (optional)", bg="#f4f4f4").pack()
+Entry(settings_tab, textvariable=qty_column_var, width=20).pack(pady=(0, 10))
+Label(settings_tab, text="Copies of Each Label", bg="#f4f4f4").pack()
+OptionMenu(settings_tab, copies_var, *[str(i) for i in range(1, 11)]).pack(pady=(0, 10))
 
 
 root.mainloop()
@@ -0,0 +1,152 @@
+from functools import lru_cache
+import numpy as np
+from barcode import Code128
+from barcode.codex import MIN_QUIET_ZONE, MIN_SIZE
+from barcode.writer import ImageWriter, mm2px, pt2mm
+from PIL import Image, ImageDraw, ImageFont
+
+# Vectorized replacement for rendering through python-barcode's ImageWriter.
+#
+# ImageWriter paints every bar and space as its own PIL rectangle. A Code128
+# symbol is just a run-length sequence of module widths, so here the runs are
+# expanded to a pixel row with np.repeat and broadcast to the bar height in
+# one step. Sizes, margins, pixel rounding and text placement follow
+# ImageWriter exactly, so the output is pixel-identical; see bench_raster.py.
+
+FOREGROUND = 0
+BACKGROUND = 255
+
+
+def _default_options():
+    defaults = {key: value for key, value in vars(ImageWriter()).items() if not key.startswith("_")}
+    defaults.update(Code128.default_writer_options)
+    # Code128.render narrows these before applying the caller's options
+    defaults.update({"module_width": MIN_SIZE, "quiet_zone": MIN_QUIET_ZONE})
+    return defaults
+
+
+_defaults = _default_options()
+
+
+def resolve_options(options):
+    """
+    Merges writer options the same way Code128(..., writer=ImageWriter()) does.
+    """
+    resolved = dict(_defaults)
+    resolved.update(options or {})
+    return resolved
+
+
+@lru_cache(maxsize=8)
+def _font(font_path, size):
+    return ImageFont.truetype(font_path, size)
+
+
+def module_pattern(code):
+    """
+    Returns the Code128 modules of `code` as a uint8 array (1 = bar).
+    """
+    modules = Code128(str(code)).build()[0]
+    return np.frombuffer(modules.encode("ascii"), dtype=np.uint8) - ord("0")
+
+
+def _pixel_row_runs(pattern, opts, width_px):
+    """
+    Returns (colors, lengths, bars_end_mm); np.repeat(colors, lengths) is one pixel row.
+
+    Run edges are accumulated in millimetres in the same order as
+    BaseWriter.render and truncated like PIL does, so every edge lands on
+    the same pixel as with ImageWriter.
+    """
+    change = np.flatnonzero(np.diff(pattern)) + 1
+    starts = np.concatenate(([0], change))
+    lengths = np.diff(np.concatenate((starts, [len(pattern)])))
+
+    steps = opts["module_width"] * lengths
+    edges_mm = np.cumsum(np.concatenate(([opts["quiet_zone"]], steps)))
+    edges_px = np.floor(edges_mm * opts["dpi"] / 25.4).astype(np.intp)
+    edges_px = np.clip(edges_px, 0, width_px)
+
+    colors = np.concatenate(([BACKGROUND], np.where(pattern[starts] == 1, FOREGROUND, BACKGROUND), [BACKGROUND]))
+    pixel_lengths = np.concatenate(([edges_px[0]], np.diff(edges_px), [width_px - edges_px[-1]]))
+    return colors.astype(np.uint8), pixel_lengths, edges_mm[-1]
+
+
+def _image_size(module_count, opts, text):
+    width = 2 * opts["quiet_zone"] + module_count * opts["module_width"]
+    height = opts["margin_bottom"] + opts["margin_top"] + opts["module_height"]
+    text_lines = len(text.splitlines())
+    if opts["font_size"] and text:
+        height += pt2mm(opts["font_size"]) / 2 * text_lines + opts["text_distance"]
+        height += opts["text_line_distance"] * (text_lines - 1)
+    return int(mm2px(width, opts["dpi"])), int(mm2px(height, opts["dpi"]))
+
+
+def _bar_rows(opts):
+    top = int(mm2px(opts["margin_top"], opts["dpi"]))
+    bottom = int(mm2px(opts["margin_top"] + opts["module_height"], opts["dpi"]))
+    return top, bottom + 1
+
+
+def rasterize_batch(codes, options=None):
+    """
+    Rasterizes the bars of many codes in a single array. All codes must have
+    the same module count (e.g. same length and character set).
+
+    Returns:
+        numpy.ndarray: uint8 array of shape (len(codes), height, width), without text.
+    """
+    opts = resolve_options(options)
+    patterns = [module_pattern(code) for code in codes]
+    module_count = len(patterns[0])
+    if any(len(pattern) != module_count for pattern in patterns):
+        raise ValueError("All codes in a batch must have the same number of modules.")
+
+    width, height = _image_size(module_count, opts, "")
+    runs = [_pixel_row_runs(pattern, opts, width) for pattern in patterns]
+    colors = np.concatenate([run[0] for run in runs])
+    lengths = np.concatenate([run[1] for run in runs])
+    rows = np.repeat(colors, lengths).reshape(len(codes), width)
+
+    top, bottom = _bar_rows(opts)
+    images = np.full((len(codes), height, width), BACKGROUND, dtype=np.uint8)
+    images[:, top:bottom, :] = rows[:, None, :]
+    return images
+
+
+def render_barcode(code, options=None):
+    """
+    Drop-in replacement for Code128(code, writer=ImageWriter()).render(options).
+
+    Returns:
+        PIL.Image.Image: RGB image of the barcode, including its text line.
+    """
+    opts = resolve_options(options)
+    code = str(code)
+    pattern = module_pattern(code)
+    text = code if opts["write_text"] else ""
+    width, height = _image_size(len(pattern), opts, text)
+
+    colors, lengths, bars_end = _pixel_row_runs(pattern, opts, width)
+    # Expand straight to interleaved RGB so each bar row is one contiguous copy
+    row = np.repeat(np.repeat(colors, lengths), 3)
+    top, bottom = _bar_rows(opts)
+    pixels = np.full((height, width * 3), BACKGROUND, dtype=np.uint8)
+    pixels[top:bottom] = row
+    image = Image.frombuffer("RGB", (width, height), pixels, "raw", "RGB", 0, 1)
+
+    font_px = int(mm2px(pt2mm(opts["font_size"]), opts["dpi"]))
+    if text and opts["font_size"] and font_px > 0:
+        # Text anchor as in BaseWriter.render and ImageWriter._paint_text
+        bars_start = opts["quiet_zone"]
+        x_mm = bars_start + (bars_end - bars_start) / 2.0
+        y_mm = opts["margin_top"]
+        y_mm += opts["module_height"]
+        y_mm += opts["text_distance"]
+        font = _font(opts["font_path"], font_px)
+        draw = ImageDraw.Draw(image)
+        for subtext in text.split("\n"):
+            position = (mm2px(x_mm, opts["dpi"]), mm2px(y_mm, opts["dpi"]))
+            draw.text(position, subtext, font=font, fill=opts["foreground"], anchor="md")
+            y_mm += pt2mm(opts["font_size"]) / 2 + opts["text_line_distance"]
+    return image
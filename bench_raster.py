@@ -0,0 +1,61 @@
+import argparse
+import time
+import numpy as np
+from barcode import Code128
+from barcode.writer import ImageWriter
+from barcode_raster import rasterize_batch, render_barcode
+from label_renderer import barcode_options
+from serials import expand_count
+
+# Compares barcode_raster against python-barcode's ImageWriter on the same
+# codes and settings: checks that every image is pixel-identical, then times both.
+#   python bench_raster.py --count 2000
+
+
+def imagewriter_render(code, options):
+    return Code128(code, writer=ImageWriter()).render(options)
+
+
+def time_per_label(fn, codes):
+    start = time.perf_counter()
+    for code in codes:
+        fn(code)
+    return (time.perf_counter() - start) / len(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy barcode rasterizer against ImageWriter.")
+    parser.add_argument("--count", type=int, default=1000, help="number of labels to render")
+    parser.add_argument("--font-size", type=int, default=14)
+    args = parser.parse_args()
+
+    codes = list(expand_count("V1380AAA", args.count))
+    options = barcode_options(args.font_size)
+    bars_only = dict(options, write_text=False)
+
+    for code in codes[:200]:
+        for opts in (options, bars_only):
+            expected = np.asarray(imagewriter_render(code, opts))
+            actual = np.asarray(render_barcode(code, opts))
+            if expected.shape != actual.shape or (expected != actual).any():
+                raise SystemExit(f"Mismatch for {code!r} with {opts}")
+    batch = rasterize_batch(codes[:200], bars_only)
+    expected = np.stack([np.asarray(imagewriter_render(code, bars_only))[:, :, 0] for code in codes[:200]])
+    if not (batch == expected).all():
+        raise SystemExit("Mismatch in rasterize_batch")
+    print("Pixel-identical to ImageWriter on 200 codes (with text, bars only, and batched).")
+
+    for label, opts in (("with text", options), ("bars only", bars_only)):
+        old = time_per_label(lambda code: imagewriter_render(code, opts), codes)
+        new = time_per_label(lambda code: render_barcode(code, opts), codes)
+        print(f"{label:>10}: ImageWriter {old * 1e3:7.3f} ms/label   NumPy {new * 1e3:7.3f} ms/label   {old / new:5.1f}x")
+
+    start = time.perf_counter()
+    rasterize_batch(codes, bars_only)
+    batched = (time.perf_counter() - start) / len(codes)
+    old = time_per_label(lambda code: imagewriter_render(code, bars_only), codes)
+    print(f"{'batched':>10}: ImageWriter {old * 1e3:7.3f} ms/label   NumPy {batched * 1e3:7.3f} ms/label   {old / batched:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from job_cache import cached_render
+from label_cli import add_ledger_arguments, add_render_arguments, ledger_job, render_settings
+from label_sources import is_supported, iter_code_batches
+from print_ledger import PrintLedger, preflight
+
+log = logging.getLogger("hot_folder")
+
+STABLE_POLLS = 2  # A file must look unchanged for this many polls before it is picked up
+# Upstream systems can write under one of these names and rename when done
+PARTIAL_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload")
+
+
+def is_candidate(name):
+    if name.startswith((".", "~")) or name.lower().endswith(PARTIAL_SUFFIXES):
+        return False
+    return is_supported(name)
+
+
+class StabilityTracker:
+    """
+    Remembers the size and mtime of inbox files between polls, so a file that
+    is still being copied in is not picked up half-written.
+    """
+
+    def __init__(self, stable_polls=STABLE_POLLS):
+        self.stable_polls = stable_polls
+        self.seen = {}  # path -> (size, mtime, polls unchanged)
+
+    def ready_files(self, inbox):
+        ready = []
+        current = {}
+        for entry in os.scandir(inbox):
+            if not entry.is_file() or not is_candidate(entry.name):
+                continue
+            stat = entry.stat()
+            size, mtime, polls = self.seen.get(entry.path, (None, None, 0))
+            polls = polls + 1 if (size, mtime) == (stat.st_size, stat.st_mtime) else 0
+            current[entry.path] = (stat.st_size, stat.st_mtime, polls)
+            if polls >= self.stable_polls and stat.st_size > 0:
+                ready.append(entry.path)
+        self.seen = current
+        return sorted(ready)
+
+    def forget(self, path):
+        self.seen.pop(path, None)
+
+
+def job_name_for(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+# A claimed file is named "<stem>_<time>_<id>__<original name>"; the original
+# name starts with the same stem, which pins down where the prefix ends even
+# if the name itself contains "__"
+_claimed_prefix = re.compile(r"^(.*)_\d{8}-\d{6}_[0-9a-f]{8}__(?=\1)", re.DOTALL)
+
+
+def original_name(claimed_name):
+    match = _claimed_prefix.match(claimed_name)
+    return claimed_name[match.end():] if match else claimed_name
+
+
+def claimed_job_name(claimed_name):
+    match = _claimed_prefix.match(claimed_name)
+    return match.group(0)[:-2] if match else None
+
+
+def process_job(work_path, job_name, dirs, column, qty_column, settings, force, ledger_path=None, duplicates="abort"):
+    """
+    Renders one claimed input file. Runs in a worker process.
+
+    The input is moved to done/ or failed/ with a matching .log file, and the
+    PDF is written to outbox/ under the unique job name. With a ledger, the
+    job is checked against it first and recorded in it.
+
+    Returns:
+        tuple: (job name, True on success)
+    """
+    ext = os.path.splitext(work_path)[1]
+    output_pdf = os.path.join(dirs["outbox"], f"{job_name}.pdf")
+    # Render to a temporary name so nothing downstream sees a partial PDF
+    temp_pdf = f"{output_pdf}.part"
+    lines = [
+        f"job: {job_name}",
+        f"input: {os.path.basename(work_path)}",
+        f"settings: {settings}",
+        f"started: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+    ]
+    start = time.perf_counter()
+    ledger = None
+    try:
+        make_batches = lambda: iter_code_batches(work_path, column, qty_column=qty_column)
+        if ledger_path:
+            ledger = PrintLedger(ledger_path)
+        with ledger_job(ledger, job_name, settings) as job:
+            if job is not None:
+                make_batches, printed = preflight(ledger, job, make_batches, duplicates)
+                lines.append(f"already printed: {len(printed)} ({duplicates})")
+            total_labels, cache_hit = cached_render(
+                make_batches, temp_pdf, settings, force=force, on_page=job.record_page if job else None
+            )
+            os.replace(temp_pdf, output_pdf)
+        lines += [
+            f"labels: {total_labels}",
+            f"cache hit: {cache_hit}",
+            f"output: {output_pdf}",
+        ]
+        ok = True
+    except Exception:
+        lines += ["error:", traceback.format_exc()]
+        ok = False
+        if os.path.exists(temp_pdf):
+            os.remove(temp_pdf)
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+    lines.append(f"elapsed: {time.perf_counter() - start:.2f}s")
+    final_dir = dirs["done"] if ok else dirs["failed"]
+    os.replace(work_path, os.path.join(final_dir, f"{job_name}{ext}"))
+    with open(os.path.join(final_dir, f"{job_name}.log"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return job_name, ok
+
+
+def watch(base_dir, column, settings, force=False, workers=2, interval=1.0, qty_column=None, ledger_path=None,
+          duplicates="abort"):
+    """
+    Watches base_dir/inbox and renders every completed file dropped there.
+
+    Jobs run concurrently in a pool of `workers` processes. While a job runs,
+    its input sits in processing/; anything left there by a crash is put back
+    in the inbox on startup.
+    """
+    dirs = {name: os.path.join(base_dir, name) for name in ("inbox", "processing", "outbox", "done", "failed")}
+    for path in dirs.values():
+        os.makedirs(path, exist_ok=True)
+
+    stranded = os.listdir(dirs["processing"])
+    if ledger_path and stranded:
+        # Their workers died with the last run; free the codes they had reserved
+        # now, or the requeued files would be refused as duplicates of themselves
+        with PrintLedger(ledger_path) as ledger:
+            ledger.release_sources(filter(None, map(claimed_job_name, stranded)))
+    for name in stranded:
+        os.replace(os.path.join(dirs["processing"], name), os.path.join(dirs["inbox"], original_name(name)))
+
+    tracker = StabilityTracker()
+    pending = {}
+    log.info("Watching %s with %d workers", dirs["inbox"], workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for future in [f for f in pending if f.done()]:
+                job_name = pending.pop(future)
+                try:
+                    _, ok = future.result()
+                    log.info("%s %s", "Finished" if ok else "Failed", job_name)
+                except Exception as e:
+                    log.error("Worker crashed on %s: %s", job_name, e)
+
+            # Only claim what the pool can start soon, so a flood of files stays in the inbox
+            for path in tracker.ready_files(dirs["inbox"])[:max(0, workers * 2 - len(pending))]:
+                job_name = job_name_for(path)
+                work_path = os.path.join(dirs["processing"], f"{job_name}__{os.path.basename(path)}")
+                try:
+                    os.replace(path, work_path)
+                except OSError:
+                    continue  # Renamed or removed since the poll
+                tracker.forget(path)
+                log.info("Queued %s as %s", os.path.basename(path), job_name)
+                future = pool.submit(process_job, work_path, job_name, dirs, column, qty_column, settings, force,
+                                     ledger_path, duplicates)
+                pending[future] = job_name
+
+            time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every label file dropped into a watched folder.")
+    parser.add_argument("base_dir", help="folder holding inbox/, outbox/, done/ and failed/ (created if missing)")
+    parser.add_argument("--workers", type=int, default=2, help="number of jobs rendered at once")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between inbox polls")
+    add_render_arguments(parser)
+    add_ledger_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        watch(args.base_dir, args.column, render_settings(args), args.force, args.workers, args.interval,
+              args.qty_column, args.ledger and os.path.abspath(args.ledger), args.duplicates)
+    except KeyboardInterrupt:
+        log.info("Stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
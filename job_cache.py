@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import shutil
+from itertools import groupby
+from label_renderer import RENDERER_VERSION, render_pdf, sequential_placements
+from label_sources import split_item
+
+CACHE_DIR = ".label_cache"
+MAX_ENTRIES = 20  # Oldest PDFs beyond this are evicted
+
+
+def job_fingerprint(code_batches, settings):
+    """
+    Hashes the codes (and quantities) of a job together with its render settings.
+
+    Args:
+        code_batches (iterable): Lists of code strings or (code, qty) pairs.
+        settings (dict): Keyword arguments that will be passed to render_pdf.
+
+    Returns:
+        tuple: (hex digest, number of labels before the copies setting)
+    """
+    digest = hashlib.sha256()
+    digest.update(RENDERER_VERSION.encode())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    count = 0
+    for batch in code_batches:
+        lines = []
+        for item in batch:
+            code, qty = split_item(item)
+            if code is None:  # Empty slots: no label, but they move everything after them
+                lines.append(f"\t{qty}")
+                continue
+            lines.append(f"{code}\t{qty}" if isinstance(item, tuple) else str(code))
+            count += qty
+        digest.update(("\n".join(lines) + "\n").encode())
+    return digest.hexdigest(), count
+
+
+def _prune(cache_dir, max_entries):
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".pdf"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass  # Another process may have evicted it already
+    entries.sort(reverse=True)
+    for _, path in entries[max_entries:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cached_render(make_batches, output_path, settings, force=False, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES,
+                  on_page=None):
+    """
+    Renders a job through the cache: if the same codes were rendered with the
+    same settings before, the stored PDF is copied to output_path instead.
+
+    Args:
+        make_batches (callable): Returns a fresh iterable of code batches. It is
+            called twice on a miss (once to fingerprint, once to render).
+        output_path (str): Where to write the PDF.
+        settings (dict): Keyword arguments for render_pdf (label_type, font_size, ...).
+        force (bool): Always regenerate, replacing any cached copy.
+        on_page (callable): As for render_pdf; on a hit it is fed the pages
+            of the cached PDF, so every copy handed out is reported.
+
+    Returns:
+        tuple: (number of labels, True if served from the cache)
+    """
+    fingerprint, count = job_fingerprint(make_batches(), settings)
+    cached_pdf = os.path.join(cache_dir, f"{fingerprint}.pdf")
+
+    if not force and os.path.exists(cached_pdf):
+        shutil.copyfile(cached_pdf, output_path)
+        os.utime(cached_pdf)  # Mark as recently used
+        if on_page is not None:
+            placements = sequential_placements(make_batches(), settings.get("copies", 1))
+            for page, labels in groupby(placements, key=lambda placement: placement[0]):
+                on_page(page, [(slot, code) for _, slot, code in labels])
+        return count * settings.get("copies", 1), True
+
+    total_labels = render_pdf(make_batches(), output_path, on_page=on_page, **settings)
+
+    # Copy into the cache under a temporary name first so readers never see a partial file
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_pdf = f"{cached_pdf}.{os.getpid()}.tmp"
+    shutil.copyfile(output_path, temp_pdf)
+    os.replace(temp_pdf, cached_pdf)
+    _prune(cache_dir, max_entries)
+    return total_labels, False
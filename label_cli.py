@@ -0,0 +1,244 @@
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+from contextlib import nullcontext
+from job_cache import cached_render
+from row_index import parse_ranges, reprint_pdf
+from label_renderer import label_types
+from raw_print import PrintDispatcher, format_stats, parse_printer
+from pdf_chunks import manifest_path, page_ranges, render_pdf_chunks
+from print_ledger import LEDGER_PATH, PrintLedger, duplicate_policies, preflight
+from label_sources import DEFAULT_COLUMN, DEFAULT_QTY_COLUMN, iter_code_batches
+from serials import serial_code_batches
+from sheet_raster import DEFAULT_DPI, image_formats, page_image_path, render_sheets
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def add_render_arguments(parser):
+    """
+    Adds the label settings shared by every command-line entry point.
+    """
+    parser.add_argument("--column", default=DEFAULT_COLUMN, help="name of the code column (default: %(default)s)")
+    parser.add_argument("--qty-column", default=DEFAULT_QTY_COLUMN,
+                        help="optional column with copies per code, used if present (default: %(default)s)")
+    parser.add_argument("--copies", type=positive_int, default=1, help="copies of every label (multiplies the qty column)")
+    parser.add_argument("--label-type", default="Avery 5160", choices=list(label_types))
+    parser.add_argument("--font-size", type=int, default=14, help="font size under the barcode")
+    parser.add_argument("--no-text", dest="show_text", action="store_false", help="omit the code text under each barcode")
+    parser.add_argument("--raster-text", dest="text_layer", action="store_false",
+                        help="bake the code text into each barcode image instead of drawing it as PDF text")
+    parser.add_argument("--no-guides", dest="show_guides", action="store_false", help="omit the label outlines")
+    parser.add_argument("--force", action="store_true", help="regenerate even if an identical job is cached")
+
+
+def add_ledger_arguments(parser):
+    """
+    Adds the print ledger options shared by every command-line entry point.
+    """
+    parser.add_argument("--ledger", default=LEDGER_PATH, help="SQLite file recording printed codes (default: %(default)s)")
+    parser.add_argument("--no-ledger", dest="ledger", action="store_const", const=None,
+                        help="neither check nor record printed codes")
+    parser.add_argument("--duplicates", default="abort", choices=duplicate_policies,
+                        help="what to do with codes the ledger has seen before (default: %(default)s)")
+
+
+def ledger_job(ledger, source, settings, kind="print"):
+    """
+    The ledger's job context, or a no-op one yielding None when there is no ledger.
+    """
+    return ledger.job(source, settings, kind) if ledger is not None else nullcontext()
+
+
+def render_settings(args):
+    return {
+        "label_type": args.label_type,
+        "font_size": args.font_size,
+        "show_text": args.show_text,
+        "show_guides": args.show_guides,
+        "copies": args.copies,
+        "text_layer": args.text_layer,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate Avery barcode label sheets without the GUI.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("input", nargs="?", help="CSV, Excel, Parquet or JSONL file with a code column")
+    source.add_argument("--range", dest="serial_spec", metavar="SPEC",
+                        help="serial spec instead of a file, e.g. 'V13802DE..V13802DI, 10359472DF+5'")
+    add_render_arguments(parser)
+    add_ledger_arguments(parser)
+    parser.add_argument("-o", "--output", help="output path (default: avery_labels.<format>)")
+    parser.add_argument("--format", default="pdf", choices=("pdf",) + image_formats,
+                        help="pdf, one png per page, or a multi-page tiff")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help="resolution of png/tiff pages")
+    chunks = parser.add_argument_group("chunked output", "publish the PDF in parts while the job is still running")
+    chunks.add_argument("--chunk-pages", type=int, help="start a new PDF every N pages")
+    chunks.add_argument("--chunk-mb", type=float, help="start a new PDF before a part exceeds N megabytes")
+    chunks.add_argument("--on-chunk", metavar="CMD",
+                        help="command run with each finished part as its last argument, e.g. 'lp -d labels'")
+    parser.add_argument("--printer", type=parse_printer, action="append", default=[], metavar="HOST[:PORT]",
+                        help="send the output to a raw-socket (port 9100) printer; repeat for several")
+    reprint = parser.add_argument_group("reprint", "render only some sheets of a CSV/JSONL input, in their original slots")
+    reprint.add_argument("--pages", type=parse_ranges, help="page numbers, e.g. 8413-8420")
+    reprint.add_argument("--rows", type=parse_ranges, help="data row numbers, e.g. 251640-251700")
+    reprint.add_argument("--codes", type=lambda text: [code.strip() for code in text.split(",") if code.strip()],
+                         help="codes, e.g. V13802DG,V13802DH")
+    return parser
+
+
+def send_to_printers(dispatcher):
+    """
+    Waits for queued output to reach every printer and reports the transfer.
+
+    Returns:
+        bool: True if nothing failed.
+    """
+    dispatcher.wait()
+    stats = dispatcher.stats()
+    dispatcher.close()
+    for printer_stats in stats:
+        print(f"  sent to {format_stats(printer_stats)}")
+    return all(printer_stats["jobs_failed"] == 0 for printer_stats in stats)
+
+
+def render_chunked(args, code_batches, output, dispatcher, job=None):
+    hooks = []
+
+    def on_chunk(path, entry):
+        print(f"  part {path}: pages {page_ranges(entry['page_numbers'])}", flush=True)
+        if job is not None:
+            job.checkpoint()  # The part is out; its codes count as printed
+        # Parts stream to the printers while the next one is generated
+        for printer in args.printer:
+            dispatcher.submit(printer, path)
+        if args.on_chunk:
+            # Don't wait for the hook; the next part is generated meanwhile
+            hooks.append(subprocess.Popen(shlex.split(args.on_chunk) + [path]))
+
+    try:
+        total_labels, parts = render_pdf_chunks(code_batches, output, chunk_pages=args.chunk_pages,
+                                                max_mb=args.chunk_mb, on_chunk=on_chunk,
+                                                on_page=job.record_page if job else None, **render_settings(args))
+    finally:
+        failed = sum(1 for hook in hooks if hook.wait() != 0)
+        # Always drain: the senders are daemon threads, and exiting now would
+        # cut off a part halfway through, which prints a truncated job
+        sent = send_to_printers(dispatcher)
+    print(f"{total_labels} labels generated in {len(parts)} parts -> {manifest_path(output)}")
+    if failed:
+        print(f"Error: --on-chunk failed for {failed} parts", file=sys.stderr)
+    if not sent:
+        print("Error: some parts could not be sent to the printer", file=sys.stderr)
+    return 1 if failed or not sent else 0
+
+
+def describe_output(output, output_format, pages):
+    """
+    Names what was written: the file, or the numbered pages for PNG output.
+    """
+    if output_format != "png":
+        return output
+    if pages == 1:
+        return page_image_path(output, 1)
+    return f"{page_image_path(output, 1)} .. {page_image_path(output, pages)} ({pages} pages)"
+
+
+def deliver(args, output):
+    """
+    Sends a finished single-file output to the --printer targets, if any.
+    """
+    if not args.printer:
+        return 0
+    dispatcher = PrintDispatcher()
+    for printer in args.printer:
+        dispatcher.submit(printer, output)
+    if not send_to_printers(dispatcher):
+        print("Error: the output could not be sent to the printer", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run(args, parser, ledger):
+    settings = render_settings(args)
+    if args.pages or args.rows or args.codes:
+        if not args.input or args.format != "pdf":
+            parser.error("--pages, --rows and --codes need an input file and PDF output")
+        output = args.output or "avery_labels_reprint.pdf"
+        source = os.path.abspath(args.input)
+        # Reprints are deliberate, so they are recorded but not checked; they
+        # repeat only what the original job printed
+        keep = ledger.original_labels(source) if ledger is not None else None
+        if ledger is not None and keep is None:
+            print("  The ledger has no print job of this input; labels a skip run left out are reprinted too")
+        with ledger_job(ledger, source, settings, kind="reprint") as job:
+            total_labels = reprint_pdf(args.input, output, args.column, args.pages, args.rows, args.codes,
+                                       args.qty_column, keep=keep, on_page=job.record_page if job else None,
+                                       **settings)
+        print(f"{total_labels} labels reprinted -> {output}")
+        return deliver(args, output)
+
+    if args.serial_spec:
+        make_batches = lambda: serial_code_batches(args.serial_spec)
+    else:
+        make_batches = lambda: iter_code_batches(args.input, args.column, qty_column=args.qty_column)
+    output = args.output or f"avery_labels.{args.format}"
+    chunked = args.chunk_pages or args.chunk_mb
+    if chunked and args.format != "pdf":
+        parser.error("--chunk-pages and --chunk-mb need PDF output")
+
+    source = args.serial_spec or os.path.abspath(args.input)
+    pages = []  # Page numbers written, for naming PNG output
+    with ledger_job(ledger, source, settings) as job:
+        if job is not None:
+            make_batches, printed = preflight(ledger, job, make_batches, args.duplicates)
+            if printed:
+                action = "left out (their labels stay blank)" if args.duplicates == "skip" else "printed again"
+                print(f"  {len(printed)} codes were already printed and are {action}")
+
+        def on_page(page, labels):
+            pages.append(page)
+            if job is not None:
+                job.record_page(page, labels)
+
+        if chunked:
+            return render_chunked(args, make_batches(), output, PrintDispatcher(), job)
+        if args.format == "pdf":
+            total_labels, cache_hit = cached_render(make_batches, output, settings, force=args.force, on_page=on_page)
+        else:
+            total_labels = render_sheets(make_batches(), output, dpi=args.dpi, image_format=args.format,
+                                         on_page=on_page, **settings)
+            cache_hit = False
+    if cache_hit:
+        print(f"{total_labels} labels (cache hit) -> {output}")
+    else:
+        print(f"{total_labels} labels generated -> {describe_output(output, args.format, len(pages))}")
+    return deliver(args, output)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.printer and args.format == "png":
+        parser.error("--printer needs PDF or TIFF output")
+    ledger = PrintLedger(args.ledger) if args.ledger else None
+    try:
+        return run(args, parser, ledger)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
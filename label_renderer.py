@@ -0,0 +1,249 @@
+import os
+from functools import lru_cache
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from barcode_raster import render_barcode
+from label_sources import split_item
+
+# Label definitions
+label_types = {
+    "Avery 5160": (2.625 * inch, 1.0 * inch),
+    "Avery 5163": (4.0 * inch, 2.0 * inch)
+}
+PAGE_WIDTH, PAGE_HEIGHT = letter
+COLUMNS = 3
+ROWS = 10
+LABELS_PER_PAGE = COLUMNS * ROWS
+H_MARGIN = 0.15 * inch  # Reduced from 0.19
+V_MARGIN = 0.3 * inch   # Keep the same
+H_GAP = 0.20 * inch     # Reduced from 0.125
+#V_GAP = 0.0 * inch      # Adjust the row gap
+PADDING = 0.08 * inch   # Padding around each barcode inside its label
+
+# Face for the code text when it is drawn as PDF text; embedded as a subset
+TEXT_FONT = "Calibri"
+TEXT_FONT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibri.ttf")
+
+# Rendered barcode images kept per job, so a code that repeats (qty, copies,
+# or the same code on several rows) is rasterized only once
+IMAGE_CACHE_SIZE = 64
+
+# Bump whenever a change alters the rendered output, so cached jobs are not reused
+RENDERER_VERSION = "4"
+
+
+def barcode_options(font_size, show_text=True):
+    return {
+        "font_size": int(font_size),
+        "font_path": TEXT_FONT_FILE,
+        "module_height": 20,
+        "write_text": show_text
+    }
+
+
+def register_text_font():
+    """
+    Registers TEXT_FONT with reportlab once per process.
+    """
+    if TEXT_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(TEXT_FONT, TEXT_FONT_FILE))
+    return TEXT_FONT
+
+
+def label_slots(label_type):
+    """
+    Returns the (x, y) bottom-left corner of every label on a page, in fill order.
+    """
+    label_w, label_h = label_types[label_type]
+
+    # Calculate vertical spacing
+    usable_height = PAGE_HEIGHT - (2 * V_MARGIN)
+    total_label_height = ROWS * label_h
+    v_gap = (usable_height - total_label_height) / (ROWS - 1)
+
+    slots = []
+    for slot in range(LABELS_PER_PAGE):
+        col = slot % COLUMNS
+        row_pos = slot // COLUMNS
+        x = H_MARGIN + col * (label_w + H_GAP)
+        y = PAGE_HEIGHT - V_MARGIN - (row_pos * (label_h + v_gap)) - label_h
+        slots.append((x, y))
+    return slots
+
+
+def define_sheet_template(c, label_type, show_guides=True):
+    """
+    Draws the static layer of a sheet once, as a PDF form XObject.
+
+    Everything that is identical on every page belongs here; each page then
+    references the form with a single c.doForm() call instead of repeating
+    the drawing operators.
+
+    Returns:
+        str: The form name, or None if the template is empty.
+    """
+    if not show_guides:
+        return None
+
+    label_w, label_h = label_types[label_type]
+    name = "sheet_template"
+    c.beginForm(name)
+
+    # Alignment guides: light-gray outline around every label area
+    c.setStrokeColorRGB(0.8, 0.8, 0.8)  # Light gray color
+    c.setLineWidth(0.25)  # Thin line
+    for x, y in label_slots(label_type):
+        c.rect(x, y, label_w, label_h)
+
+    c.endForm()
+    return name
+
+
+def sequential_placements(code_batches, copies=1):
+    """
+    Yields (page, slot, code) for codes filling sheets in order, from page 0 slot 0.
+
+    Items may be (code, qty) pairs; each code then fills qty * copies
+    consecutive slots, continuing across page breaks. A code of None leaves
+    its slots empty, and a page with no labels at all is not produced.
+    """
+    # Checked here rather than in the generator, so a bad value fails at the call
+    if copies < 1:
+        raise ValueError(f"Copies must be at least 1, not {copies}.")
+    return _placements(code_batches, copies)
+
+
+def _placements(code_batches, copies):
+    idx = 0
+    for batch in code_batches:
+        for item in batch:
+            code, qty = split_item(item)
+            if code is None:
+                idx += qty * copies
+                continue
+            for _ in range(qty * copies):
+                yield idx // LABELS_PER_PAGE, idx % LABELS_PER_PAGE, code
+                idx += 1
+
+
+def render_placements(placements, output_path, label_type="Avery 5160", font_size=14, show_text=True, show_guides=True,
+                      text_layer=True, on_page=None):
+    """
+    Draws each code at a given sheet position and writes the PDF.
+
+    Placements must be grouped by page; every distinct page number becomes one
+    PDF page, so a sparse set (e.g. a reprint of pages 8413-8420) produces only
+    those sheets, with every label in its original slot.
+
+    Args:
+        placements (iterable): (page, slot, code) tuples, slot in 0..LABELS_PER_PAGE-1.
+        output_path, label_type, font_size, show_text, show_guides, text_layer, on_page: As for render_pdf.
+
+    Returns:
+        int: Number of labels written.
+    """
+    label_w, label_h = label_types[label_type]
+    slots = label_slots(label_type)
+    draw_text = show_text and text_layer
+    # With a text layer the images carry only the bars
+    options = barcode_options(font_size, show_text and not text_layer)
+    text_band = 0
+    if draw_text:
+        font = register_text_font()
+        ascent, descent = pdfmetrics.getAscentDescent(font, font_size)
+        text_band = ascent - descent
+    # invariant=1 fixes the creation date and document ID, so identical jobs
+    # produce byte-identical PDFs (see job_cache)
+    c = pdf_canvas.Canvas(output_path, pagesize=letter, invariant=1)
+    template = define_sheet_template(c, label_type, show_guides)
+
+    count = 0
+    current_page = None
+    text = None
+    page_labels = []
+
+    # Barcode images are rendered in memory, so concurrent jobs never share temp
+    # files. Repeats of a code reuse the image; reportlab embeds it only once.
+    @lru_cache(maxsize=IMAGE_CACHE_SIZE)
+    def barcode_image_for(code):
+        return ImageReader(render_barcode(code, options))
+
+    for page, slot, barcode_data in placements:
+        barcode_image = barcode_image_for(barcode_data)
+
+        if page != current_page:
+            if current_page is not None:
+                if text is not None:
+                    c.drawText(text)
+                c.showPage()
+                if on_page is not None:
+                    on_page(current_page, page_labels)
+                page_labels = []
+            if template:
+                c.doForm(template)
+            if draw_text:
+                # One text object per page: the font is selected once and
+                # every label only moves the text origin
+                text = c.beginText()
+                text.setFont(font, font_size)
+            current_page = page
+        x, y = slots[slot]
+
+        # Draw the barcode centered inside the label, with padding
+        c.drawImage(
+            barcode_image,
+            x + PADDING,
+            y + PADDING + text_band,
+            width=label_w - (2 * PADDING),
+            height=label_h - (2 * PADDING) - text_band
+        )
+        if draw_text:
+            code = str(barcode_data)
+            text.setTextOrigin(x + (label_w - pdfmetrics.stringWidth(code, font, font_size)) / 2, y + PADDING - descent)
+            text.textOut(code)
+        page_labels.append((slot, barcode_data))
+        count += 1
+
+    if text is not None:
+        c.drawText(text)
+    c.save()
+    if on_page is not None and current_page is not None:
+        on_page(current_page, page_labels)
+    return count
+
+
+def render_pdf(code_batches, output_path, label_type="Avery 5160", font_size=14, show_text=True, show_guides=True,
+               copies=1, text_layer=True, on_page=None):
+    """
+    Lays out barcodes on label sheets and writes them to a PDF.
+
+    Args:
+        code_batches (iterable): Lists of code strings, e.g. from label_sources.iter_code_batches.
+        output_path (str): Where to write the PDF.
+        label_type (str): Key into label_types.
+        font_size (int): Font size of the text under each barcode.
+        show_text (bool): Whether to print the code as text under each barcode.
+        show_guides (bool): Whether to outline every label area (for calibrating stock).
+        copies (int): Copies of every code, multiplied with any per-row qty.
+        text_layer (bool): Draw the text as real (searchable) PDF text in the
+            embedded TEXT_FONT, rather than as pixels inside each barcode image.
+        on_page (callable): Called as on_page(page, [(slot, code), ...]) after
+            each page is laid out, e.g. to record it in the print ledger.
+
+    Returns:
+        int: Number of labels written.
+    """
+    return render_placements(
+        sequential_placements(code_batches, copies),
+        output_path,
+        label_type=label_type,
+        font_size=font_size,
+        show_text=show_text,
+        show_guides=show_guides,
+        text_layer=text_layer,
+        on_page=on_page,
+    )
@@ -0,0 +1,199 @@
+import json
+import math
+import os
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+    parquet_enabled = True
+except ImportError:
+    parquet_enabled = False
+
+DEFAULT_COLUMN = "code"
+DEFAULT_QTY_COLUMN = "qty"
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _missing_column(column):
+    return ValueError(f"Input must contain a '{column}' column.")
+
+
+def parse_qty(value):
+    """
+    Converts a quantity cell to a non-negative int; blank means 1.
+    """
+    text = "" if value is None else str(value).strip()
+    if not text:
+        return 1
+    try:
+        qty = float(text)
+    except ValueError:
+        qty = -1
+    # inf and nan parse as floats but are no number of copies
+    if not math.isfinite(qty) or qty < 0 or qty != int(qty):
+        raise ValueError(f"Invalid quantity '{text}'; use a whole number of copies.")
+    return int(qty)
+
+
+def _code(value, row):
+    # Blank cells (CSV/Excel) and nulls (Parquet/JSONL) would otherwise
+    # become a barcode of "" or "None"
+    if value is None or not str(value).strip():
+        raise ValueError(f"Row {row} has no code.")
+    return str(value)
+
+
+def _items(codes, quantities, first_row):
+    """
+    Normalizes one batch of raw column values; first_row is the 1-based data
+    row number of its first entry, for error messages.
+    """
+    codes = [_code(value, first_row + i) for i, value in enumerate(codes)]
+    if quantities is None:
+        return codes
+    return [(code, parse_qty(qty)) for code, qty in zip(codes, quantities)]
+
+
+# --- Readers ---
+# Every reader projects only the requested columns, keeps codes as strings
+# (so "00123" stays "00123") and yields them in batches. Batches are lists of
+# codes, or of (code, qty) pairs when qty_column is given and the input has it.
+# A row without a code is an error in every format.
+
+def read_csv_batches(path, column=DEFAULT_COLUMN, batch_size=DEFAULT_BATCH_SIZE, qty_column=None):
+    header = pd.read_csv(path, nrows=0).columns
+    if column not in header:
+        raise _missing_column(column)
+    columns = [column] + ([qty_column] if qty_column in header else [])
+    chunks = pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={name: str for name in columns},
+        keep_default_na=False,
+        chunksize=batch_size,
+    )
+    row = 1
+    for chunk in chunks:
+        quantities = chunk[qty_column].tolist() if len(columns) > 1 else None
+        yield _items(chunk[column].tolist(), quantities, row)
+        row += len(chunk)
+
+
+def read_excel_batches(path, column=DEFAULT_COLUMN, batch_size=DEFAULT_BATCH_SIZE, qty_column=None):
+    header = pd.read_excel(path, nrows=0).columns
+    if column not in header:
+        raise _missing_column(column)
+    columns = [column] + ([qty_column] if qty_column in header else [])
+    # Excel has no streaming reader in pandas; load the needed columns and slice them
+    df = pd.read_excel(path, usecols=columns, dtype={name: str for name in columns}, keep_default_na=False)
+    items = _items(df[column].tolist(), df[qty_column].tolist() if len(columns) > 1 else None, 1)
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def read_parquet_batches(path, column=DEFAULT_COLUMN, batch_size=DEFAULT_BATCH_SIZE, qty_column=None):
+    if not parquet_enabled:
+        raise ValueError("Reading Parquet files requires pyarrow.")
+    parquet_file = pq.ParquetFile(path)
+    names = parquet_file.schema_arrow.names
+    if column not in names:
+        raise _missing_column(column)
+    columns = [column] + ([qty_column] if qty_column in names else [])
+    row = 1
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        quantities = batch.column(1).to_pylist() if len(columns) > 1 else None
+        yield _items(batch.column(0).to_pylist(), quantities, row)
+        row += batch.num_rows
+
+
+def read_jsonl_batches(path, column=DEFAULT_COLUMN, batch_size=DEFAULT_BATCH_SIZE, qty_column=None):
+    codes = []
+    quantities = []
+    row = 1  # Data row number of codes[0]; blank lines are not rows
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {line_no} is not a JSON object.")
+            if column not in record:
+                raise ValueError(f"Line {line_no} has no '{column}' field.")
+            codes.append(record[column])
+            quantities.append(record.get(qty_column))
+            if len(codes) >= batch_size:
+                yield _items(codes, quantities if qty_column else None, row)
+                row += len(codes)
+                codes, quantities = [], []
+    if codes:
+        yield _items(codes, quantities if qty_column else None, row)
+
+
+# File extension -> reader
+readers = {
+    ".csv": read_csv_batches,
+    ".xlsx": read_excel_batches,
+    ".parquet": read_parquet_batches,
+    ".jsonl": read_jsonl_batches,
+}
+
+# For tkinter file dialogs
+input_filetypes = [
+    ("Label Data", " ".join(f"*{ext}" for ext in readers)),
+    ("CSV Files", "*.csv"),
+    ("Excel Files", "*.xlsx"),
+    ("Parquet Files", "*.parquet"),
+    ("JSON Lines Files", "*.jsonl"),
+]
+
+
+def is_supported(path):
+    return os.path.splitext(path)[1].lower() in readers
+
+
+def iter_code_batches(path, column=DEFAULT_COLUMN, batch_size=DEFAULT_BATCH_SIZE, qty_column=None):
+    """
+    Yields lists of code strings from any supported input file.
+
+    Args:
+        path (str): Input file; the reader is chosen by its extension.
+        column (str): Name of the column holding the barcode data.
+        batch_size (int): Maximum number of codes per yielded list.
+        qty_column (str): Optional column with the number of copies of each
+            code. If the input has it, items are (code, qty) pairs instead.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in readers:
+        raise ValueError(f"Unsupported file type '{ext}'. Use one of: {', '.join(readers)}")
+    return readers[ext](path, column, batch_size, qty_column)
+
+
+def batched(codes, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Groups any iterable of codes into lists of at most `batch_size`.
+    """
+    batch = []
+    for code in codes:
+        batch.append(code)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def split_item(item):
+    """
+    Returns (code, qty) for either form of batch item. A code of None marks
+    slots that stay empty (see print_ledger.preflight).
+    """
+    if isinstance(item, tuple):
+        return item
+    return item, 1
+
+
+def first_code(path, column=DEFAULT_COLUMN):
+    for batch in iter_code_batches(path, column, batch_size=1):
+        if batch:
+            return batch[0]
+    return None
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+from itertools import groupby
+from label_renderer import render_placements, sequential_placements
+
+# Splits one large job into a series of complete PDFs, published one at a
+# time while the rest is still being generated, so printing can start on
+# the first sheets right away and no single file grows past what a spooler
+# accepts. Chunks are named avery_labels_c0001.pdf, avery_labels_c0002.pdf,
+# ... and listed in avery_labels.manifest.json, which is rewritten after
+# every chunk and marked complete at the end. Each entry lists the job's page
+# numbers it holds; they need not be contiguous, since a page left with no
+# labels (all its codes skipped as duplicates) is not produced.
+
+# With only a byte limit, the first chunk is this many pages; its size then
+# predicts how many pages fit in the following ones
+FIRST_CHUNK_PAGES = 1
+
+
+def chunk_path(output_path, chunk_number):
+    """
+    Path of one chunk, e.g. avery_labels.pdf -> avery_labels_c0001.pdf.
+    """
+    stem = os.path.splitext(output_path)[0]
+    return f"{stem}_c{chunk_number:04d}.pdf"
+
+
+def manifest_path(output_path):
+    return f"{os.path.splitext(output_path)[0]}.manifest.json"
+
+
+def page_ranges(page_numbers):
+    """
+    Formats sorted page numbers as "1-4, 7", the form --pages accepts.
+    """
+    ranges = []
+    for number in page_numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_manifest(path, manifest):
+    temp = f"{path}.part"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp, path)
+
+
+def _take_pages(first_page, pages, count, taken):
+    """
+    Yields the placements of `first_page` and of up to count-1 following
+    pages, appending each page number to `taken`.
+    """
+    page = first_page
+    while True:
+        taken.append(page[0])
+        yield from page[1]
+        if len(taken) >= count:
+            return
+        page = next(pages, None)
+        if page is None:
+            return
+
+
+def render_pdf_chunks(code_batches, output_path, label_type="Avery 5160", font_size=14, show_text=True,
+                      show_guides=True, copies=1, text_layer=True, chunk_pages=None, max_mb=None, on_chunk=None,
+                      on_page=None):
+    """
+    Lays out barcodes like render_pdf, but writes a new PDF every few pages.
+
+    Args:
+        code_batches (iterable): Lists of code strings or (code, qty) pairs.
+        output_path (str): Base name; chunks and the manifest are named after it.
+        label_type, font_size, show_text, show_guides, copies, text_layer, on_page: As for render_pdf.
+        chunk_pages (int): Maximum pages per chunk.
+        max_mb (float): Maximum size per chunk. Chunk sizes are predicted from
+            the bytes per page of the chunk before, so a chunk can overshoot
+            slightly when pages vary a lot.
+        on_chunk (callable): Called as on_chunk(path, entry) once a chunk is
+            complete and in place, e.g. to send it to the printer.
+
+    Returns:
+        tuple: (number of labels written, list of manifest entries)
+    """
+    if not chunk_pages and not max_mb:
+        raise ValueError("Give chunk_pages and/or max_mb to split the output.")
+    settings = dict(label_type=label_type, font_size=font_size, show_text=show_text,
+                    show_guides=show_guides, text_layer=text_layer, on_page=on_page)
+    manifest_file = manifest_path(output_path)
+    manifest = {"output": os.path.basename(output_path), "complete": False, "chunks": []}
+    _write_manifest(manifest_file, manifest)
+
+    pages = groupby(sequential_placements(code_batches, copies), key=lambda placement: placement[0])
+    page_count = chunk_pages or FIRST_CHUNK_PAGES
+    total_labels = 0
+    next_page = next(pages, None)
+    while next_page is not None:
+        path = chunk_path(output_path, len(manifest["chunks"]) + 1)
+        # Write under a temporary name so a spooler never picks up a partial file
+        temp = f"{path}.part"
+        taken = []
+        labels = render_placements(_take_pages(next_page, pages, page_count, taken), temp, **settings)
+        os.replace(temp, path)
+
+        size = os.path.getsize(path)
+        entry = {
+            "file": os.path.basename(path),
+            "first_page": taken[0] + 1,
+            "pages": len(taken),
+            "page_numbers": [page + 1 for page in taken],
+            "labels": labels,
+            "bytes": size,
+            "sha256": _file_sha256(path),
+        }
+        manifest["chunks"].append(entry)
+        _write_manifest(manifest_file, manifest)
+        total_labels += labels
+        if on_chunk is not None:
+            on_chunk(path, entry)
+        next_page = next(pages, None)
+
+        if max_mb:
+            pages_that_fit = int(max_mb * 1024 * 1024 / (size / entry["pages"]))
+            page_count = max(1, min(pages_that_fit, chunk_pages or pages_that_fit))
+
+    manifest["complete"] = True
+    manifest["labels"] = total_labels
+    _write_manifest(manifest_file, manifest)
+    return total_labels, manifest["chunks"]
@@ -0,0 +1,341 @@
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from label_sources import split_item
+
+# Local record of every label that has been printed, so the same codes are
+# not printed twice by accident.
+#
+#   jobs     one row per run: job id, kind (print/reprint), source, settings,
+#            time, the last page known to have been delivered, and when the
+#            run last showed signs of life (heartbeat)
+#   printed  one row per label: code, job, page, slot
+#
+# printed is keyed by code first (WITHOUT ROWID, so rows are stored in code
+# order), which makes "was this code printed?" a single index probe however
+# much history there is. Rows are committed a page at a time, so concurrent
+# jobs (hot folder workers) never wait long for each other, but they only
+# count once their job confirms the page: when it completes, or when a chunk
+# goes out. Pages of a failed or interrupted run are ignored.
+#
+#   reserved one row per code of a running job: code, job
+#
+# preflight checks a job's codes and reserves them a batch at a time, each
+# batch in one transaction, so two jobs started together with overlapping
+# codes cannot both pass the check.
+# Reservations end with the job. A process killed outright cannot release
+# its own, so they also lapse once the job's heartbeat, refreshed with every
+# page, is RESERVATION_TIMEOUT old; the hot folder frees those of the jobs it
+# recovers at startup right away.
+
+LEDGER_PATH = "print_ledger.sqlite3"
+duplicate_policies = ("allow", "skip", "abort")
+PREFLIGHT_BATCH = 100_000  # Codes checked per query
+RESERVATION_TIMEOUT = 10 * 60  # Seconds without a heartbeat before a job's reservations lapse
+
+_schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    source TEXT,
+    settings TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    printed_through INTEGER NOT NULL DEFAULT -1,
+    heartbeat_at REAL
+);
+CREATE TABLE IF NOT EXISTS printed (
+    code TEXT NOT NULL,
+    job INTEGER NOT NULL REFERENCES jobs(id),
+    page INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    PRIMARY KEY (code, job, page, slot)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reserved (
+    code TEXT NOT NULL,
+    job INTEGER NOT NULL REFERENCES jobs(id),
+    PRIMARY KEY (code, job)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS reserved_job ON reserved (job);
+"""
+
+
+class JobRecorder:
+    """
+    Adds the labels of one running job to the ledger.
+    """
+
+    def __init__(self, conn, job_row, job_id):
+        self.conn = conn
+        self.job_row = job_row
+        self.job_id = job_id
+        self.labels = 0
+        self.last_page = None
+
+    def record_page(self, page, labels):
+        """
+        Records one finished page; matches the on_page hook of the renderers.
+
+        Args:
+            page (int): 0-based page number within the job.
+            labels (list): (slot, code) pairs on that page.
+        """
+        self.conn.execute("BEGIN")
+        with self.conn:  # Commits, or rolls back if the insert fails
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO printed (code, job, page, slot) VALUES (?, ?, ?, ?)",
+                [(str(code), self.job_row, page, slot) for slot, code in labels],
+            )
+            self.conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), self.job_row))
+        self.labels += len(labels)
+        self.last_page = page
+
+    def checkpoint(self):
+        """
+        Confirms the pages recorded so far, e.g. once a chunk has been handed
+        to the printer and can no longer be taken back.
+        """
+        if self.last_page is not None:
+            self.conn.execute("UPDATE jobs SET printed_through = ? WHERE id = ?", (self.last_page, self.job_row))
+
+    def reserve(self, codes):
+        """
+        Claims codes for this job until it ends; call inside preflight's transaction.
+        """
+        self.conn.executemany("INSERT OR IGNORE INTO reserved (code, job) VALUES (?, ?)",
+                              ((str(code), self.job_row) for code in codes))
+        self.conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), self.job_row))
+
+    def release(self):
+        self.conn.execute("DELETE FROM reserved WHERE job = ?", (self.job_row,))
+
+
+class PrintLedger:
+    """
+    SQLite ledger of printed codes. Safe to share between processes (the hot
+    folder's workers each open their own).
+    """
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        # Autocommit; multi-statement writes use explicit BEGIN/COMMIT
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_schema)
+        # Ledgers created before heartbeats; their jobs' reservations count as lapsed
+        if "heartbeat_at" not in [row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")]:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def job(self, source, settings, kind="print"):
+        """
+        Opens a job record; yields a JobRecorder whose record_page is passed
+        to the renderer as on_page. Its pages are confirmed if the block
+        completes; if it raises, only pages confirmed by checkpoint() count.
+        Either way its reservations are released.
+        """
+        job_id = uuid.uuid4().hex
+        cursor = self.conn.execute(
+            "INSERT INTO jobs (job_id, kind, source, settings, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, source, json.dumps(settings, sort_keys=True), time.strftime("%Y-%m-%d %H:%M:%S"),
+             time.time()),
+        )
+        recorder = JobRecorder(self.conn, cursor.lastrowid, job_id)
+        try:
+            yield recorder
+            recorder.checkpoint()
+        finally:
+            recorder.release()
+
+    def release_stale(self, timeout=RESERVATION_TIMEOUT):
+        """
+        Drops the reservations of jobs whose heartbeat is older than timeout
+        seconds, i.e. left behind by a process that was killed.
+        """
+        self.conn.execute(
+            "DELETE FROM reserved WHERE job IN (SELECT id FROM jobs WHERE heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (time.time() - timeout,),
+        )
+
+    def release_sources(self, sources):
+        """
+        Drops the reservations of every job of the given sources, e.g. jobs
+        known to have died with their process.
+        """
+        self.conn.executemany("DELETE FROM reserved WHERE job IN (SELECT id FROM jobs WHERE source = ?)",
+                              ((source,) for source in sources))
+
+    def is_printed(self, code):
+        row = self.conn.execute(
+            "SELECT 1 FROM printed p JOIN jobs j ON j.id = p.job AND p.page <= j.printed_through WHERE p.code = ? LIMIT 1",
+            (str(code),),
+        ).fetchone()
+        return row is not None
+
+    def _candidate_rows(self, codes, queries):
+        """
+        Loads codes into the temp table `candidates` and runs (sql, params)
+        queries against it.
+
+        Returns:
+            list: The rows of all queries.
+        """
+        rows = []
+        # One savepoint around the inserts instead of a transaction per code
+        self.conn.execute("SAVEPOINT lookup")
+        try:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (code TEXT PRIMARY KEY) WITHOUT ROWID")
+            self.conn.executemany("INSERT OR IGNORE INTO candidates (code) VALUES (?)", ((str(c),) for c in codes))
+            for sql, params in queries:
+                rows += self.conn.execute(sql, params).fetchall()
+        finally:
+            self.conn.execute("DELETE FROM candidates")
+            self.conn.execute("RELEASE lookup")
+        return rows
+
+    def find_printed(self, codes, job=None):
+        """
+        Looks up many codes in one query.
+
+        Args:
+            codes (iterable): Codes to look up.
+            job (JobRecorder): With a job, codes reserved by any other running
+                job count as printed too.
+
+        Returns:
+            dict: code -> (job id, started at) of the first job that printed
+            (or reserved) it, for the codes that have been printed.
+        """
+        queries = [(
+            "SELECT c.code, j.job_id, MIN(j.started_at) FROM candidates c "
+            "JOIN printed p ON p.code = c.code JOIN jobs j ON j.id = p.job AND p.page <= j.printed_through "
+            "GROUP BY c.code",
+            (),
+        )]
+        if job is not None:
+            queries.append((
+                "SELECT c.code, j.job_id, MIN(j.started_at) FROM candidates c "
+                "JOIN reserved r ON r.code = c.code AND r.job != ? JOIN jobs j ON j.id = r.job "
+                "GROUP BY c.code",
+                (job.job_row,),
+            ))
+        rows = self._candidate_rows(codes, queries)
+        found = {}
+        for code, job_id, started_at in rows:
+            found.setdefault(code, (job_id, started_at))  # Printed pages take precedence
+        return found
+
+
+    def original_labels(self, source):
+        """
+        Returns a filter for reprints of `source`, or None if the ledger has
+        no print job of it.
+
+        The filter takes (page, slot, code) placements and keeps those the
+        last print job of `source` printed, so a reprint matches the original
+        sheets: slots that job left empty (skipped duplicates) stay empty.
+        """
+        row = self.conn.execute(
+            "SELECT id FROM jobs WHERE source = ? AND kind = 'print' AND printed_through >= 0 ORDER BY id DESC LIMIT 1",
+            (source,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        def keep(placements):
+            placements = list(placements)
+            printed = set(self._candidate_rows(
+                (code for _, _, code in placements),
+                [("SELECT p.page, p.slot, p.code FROM candidates c JOIN printed p ON p.code = c.code AND p.job = ?",
+                  (row[0],))],
+            ))
+            return [placement for placement in placements if placement in printed]
+        return keep
+
+
+def _lookup_batches(code_batches, batch_size):
+    # Repeats are harmless: the candidates table keeps each code once
+    batch = []
+    for codes in code_batches:
+        batch.extend(split_item(item)[0] for item in codes)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def preflight(ledger, job, make_batches, policy="abort"):
+    """
+    Checks a job against the ledger before anything is rendered, and reserves
+    its codes for it.
+
+    Each batch is checked and reserved in one transaction, so of two jobs
+    started together with overlapping codes, the second sees the first one's
+    codes as printed. The write lock is held for one batch at a time, and the
+    input is read outside it, so other jobs keep recording their pages.
+
+    Args:
+        ledger (PrintLedger): The ledger to check.
+        job (JobRecorder): The job about to print, from ledger.job().
+        make_batches (callable): Returns a fresh iterable of code batches.
+        policy (str): What to do with already-printed codes: "allow" prints
+            them again, "skip" leaves their slots empty, "abort" refuses the job.
+
+    Returns:
+        tuple: (make_batches to render, dict of already-printed codes as from find_printed)
+    """
+    if policy not in duplicate_policies:
+        raise ValueError(f"Unknown duplicate policy '{policy}'. Use one of: {', '.join(duplicate_policies)}")
+    ledger.release_stale()
+    printed = {}
+    reserved_any = False
+    for codes in _lookup_batches(make_batches(), PREFLIGHT_BATCH):
+        if printed and policy == "abort":
+            # The job is refused; the rest is only looked up for the count
+            printed.update(ledger.find_printed(codes, job))
+            continue
+        # IMMEDIATE takes the write lock before the lookup, so no other job
+        # can reserve this batch's codes between the check and the reservation
+        ledger.conn.execute("BEGIN IMMEDIATE")
+        with ledger.conn:
+            found = ledger.find_printed(codes, job)
+            remaining = [code for code in codes if str(code) not in found]
+            job.reserve(remaining)
+        printed.update(found)
+        reserved_any = reserved_any or bool(remaining)
+
+    if printed and policy == "abort":
+        job.release()
+        code, (job_id, started_at) = min(printed.items(), key=lambda item: item[1][1])
+        raise ValueError(f"{len(printed)} codes were already printed or are being printed (e.g. '{code}' on "
+                         f"{started_at}, job {job_id}). Choose skip or allow to continue.")
+    if not reserved_any and policy == "skip":
+        job.release()
+        raise ValueError(f"All {len(printed)} codes were already printed; nothing left to print.")
+    if not printed or policy == "allow":
+        return make_batches, printed
+
+    def remaining_batches():
+        # A skipped code keeps its slots, left empty, so every other label sits
+        # where it would in the full job (see PrintLedger.original_labels for reprints)
+        for batch in make_batches():
+            items = []
+            for item in batch:
+                code, qty = split_item(item)
+                items.append((None, qty) if str(code) in printed else item)
+            yield items
+
+    return remaining_batches, printed
@@ -0,0 +1,323 @@
+import argparse
+import io
+import logging
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+log = logging.getLogger("raw_print")
+
+# Sends finished output straight to network printers over raw TCP (the
+# "port 9100" / JetDirect protocol: the printer prints whatever bytes arrive).
+#
+# Each printer gets one sender thread fed by a queue, so parts of a chunked
+# job go out as soon as they are published, while the next part is still
+# being generated. Every job travels over a connection of its own: closing it
+# is how a raw-socket printer knows the job is complete, so two PDFs are never
+# run together into one stream it cannot parse.
+#
+# Connecting is retried with exponential backoff while the printer is
+# unreachable. Once bytes have gone out, a job that breaks off is not sent
+# again, because the part that arrived may already be printing; it counts as
+# failed instead.
+
+DEFAULT_PORT = 9100
+BLOCK_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 10.0  # Only for connecting; a send waits as long as the printer does (e.g. out of paper)
+MAX_ATTEMPTS = 5
+BACKOFF_START = 0.5  # Seconds before the first retry; doubles on each further one
+BACKOFF_MAX = 30.0
+
+
+def parse_printer(text):
+    """
+    Parses "10.0.0.7" or "10.0.0.7:9101" into (host, port).
+    """
+    host, sep, port = text.strip().rpartition(":")
+    if not sep:
+        host, port = port, ""
+    try:
+        return host, int(port) if port else DEFAULT_PORT
+    except ValueError:
+        raise ValueError(f"Invalid printer '{text}'; use host or host:port.")
+
+
+class PrinterConnection:
+    """
+    One printer: a queue of pending jobs and the sender thread working through it.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, max_attempts=MAX_ATTEMPTS, backoff=BACKOFF_START):
+        self.host = host
+        self.port = port
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()  # Guards the counters below
+        self.bytes_sent = 0
+        self.send_seconds = 0.0
+        self.jobs_sent = 0
+        self.jobs_failed = 0
+        self.retries = 0
+        self.thread = threading.Thread(target=self._run, name=f"printer-{host}:{port}", daemon=True)
+        self.thread.start()
+
+    def __repr__(self):
+        return f"{self.host}:{self.port}"
+
+    def _connect(self):
+        """
+        Opens a connection, retrying with backoff while the printer is unreachable.
+
+        Returns:
+            socket.socket: The connection, or None after max_attempts failures.
+        """
+        delay = self.backoff
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT)
+                break
+            except OSError as e:
+                if attempt == self.max_attempts:
+                    log.error("Giving up on %s after %d attempts: %s", self, attempt, e)
+                    return None
+                with self.lock:
+                    self.retries += 1
+                log.warning("Cannot reach %s (%s); retrying in %.1fs", self, e, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, BACKOFF_MAX)
+        sock.settimeout(None)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _send_blocks(self, sock, f):
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            start = time.perf_counter()
+            sock.sendall(block)
+            with self.lock:
+                self.send_seconds += time.perf_counter() - start
+                self.bytes_sent += len(block)
+
+    @staticmethod
+    def _end_job(sock):
+        """
+        Closes the connection, which ends the job on the printer.
+        """
+        sock.shutdown(socket.SHUT_WR)
+        # Read until the printer closes its side too: closing with a reply
+        # still unread resets the connection and can drop bytes not yet delivered
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            while sock.recv(BLOCK_SIZE):
+                pass
+        except socket.timeout:
+            pass
+
+    def _send_job(self, source):
+        """
+        Sends one job on a connection of its own.
+
+        Returns:
+            bool: True if the whole job was handed to the printer.
+        """
+        try:
+            f = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else open(source, "rb")
+        except OSError as e:
+            log.error("Nothing to send to %s: %s", self, e)
+            return False
+        with f:
+            sock = self._connect()
+            if sock is None:
+                return False
+            with sock:
+                try:
+                    self._send_blocks(sock, f)
+                    self._end_job(sock)
+                    return True
+                except OSError as e:
+                    log.error("Send to %s broke off after %d of the job's bytes (%s); not resending it",
+                              self, f.tell(), e)
+                    return False
+
+    def _run(self):
+        while True:
+            source, done = self.jobs.get()
+            if source is None:
+                self.jobs.task_done()
+                return
+            ok = self._send_job(source)
+            with self.lock:
+                if ok:
+                    self.jobs_sent += 1
+                else:
+                    self.jobs_failed += 1
+            if done is not None:
+                done(source, ok)
+            self.jobs.task_done()
+
+    def submit(self, source, done=None):
+        """
+        Queues a file path or bytes for sending; returns immediately.
+
+        Args:
+            source (str | bytes): File to send, or the data itself.
+            done (callable): Called as done(source, ok) from the sender thread.
+        """
+        self.jobs.put((source, done))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "printer": repr(self),
+                "queue_depth": self.jobs.unfinished_tasks,  # Includes the job being sent
+                "bytes_sent": self.bytes_sent,
+                "bytes_per_sec": self.bytes_sent / self.send_seconds if self.send_seconds else 0.0,
+                "jobs_sent": self.jobs_sent,
+                "jobs_failed": self.jobs_failed,
+                "retries": self.retries,
+            }
+
+    def close(self):
+        """
+        Sends everything still queued, then stops the sender thread.
+        """
+        self.jobs.put((None, None))
+        self.thread.join()
+
+
+class PrintDispatcher:
+    """
+    Pool of printer queues, one per (host, port), created on first use.
+    """
+
+    def __init__(self, **connection_options):
+        self.connection_options = connection_options
+        self.printers = {}
+        self.lock = threading.Lock()
+
+    def printer(self, host, port=DEFAULT_PORT):
+        with self.lock:
+            if (host, port) not in self.printers:
+                self.printers[(host, port)] = PrinterConnection(host, port, **self.connection_options)
+            return self.printers[(host, port)]
+
+    def submit(self, printer, source, done=None):
+        """
+        Queues `source` for `printer`, given as "host[:port]" or (host, port).
+        """
+        host, port = parse_printer(printer) if isinstance(printer, str) else printer
+        self.printer(host, port).submit(source, done)
+
+    def wait(self):
+        """
+        Blocks until every queued job has been sent or given up on.
+        """
+        for connection in list(self.printers.values()):
+            connection.jobs.join()
+
+    def stats(self):
+        return [connection.stats() for connection in self.printers.values()]
+
+    def close(self):
+        for connection in list(self.printers.values()):
+            connection.close()
+        self.printers.clear()
+
+
+def format_stats(stats):
+    return (f"{stats['printer']}: {stats['bytes_sent']} bytes at {stats['bytes_per_sec'] / 1e6:.1f} MB/s, "
+            f"{stats['jobs_sent']} jobs sent, {stats['jobs_failed']} failed, {stats['retries']} retries, "
+            f"queue {stats['queue_depth']}")
+
+
+# --- Stand-in printer ---
+# Accepts raw print connections like a port-9100 printer and records what
+# arrives, so dispatch can be verified without hardware.
+
+class StandInPrinter(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, output_dir=None):
+        super().__init__((host, port), _StandInHandler)
+        self.output_dir = output_dir
+        self.connections = []  # Bytes received, one entry per connection
+        self.lock = threading.Lock()
+
+    @property
+    def address(self):
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def received(self):
+        with self.lock:
+            return b"".join(bytes(data) for data in self.connections)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _StandInHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = bytearray()
+        with self.server.lock:
+            self.server.connections.append(data)
+            number = len(self.server.connections)
+        while True:
+            block = self.request.recv(BLOCK_SIZE)
+            if not block:
+                break
+            with self.server.lock:
+                data.extend(block)
+        log.info("Connection %d closed after %d bytes", number, len(data))
+        if self.server.output_dir:
+            with open(os.path.join(self.server.output_dir, f"connection_{number:04d}.prn"), "wb") as f:
+                f.write(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send files to raw-socket (port 9100) printers, or stand in for one.")
+    parser.add_argument("files", nargs="*", help="files to send, in order")
+    parser.add_argument("--printer", action="append", default=[], help="host[:port]; repeat to send to several")
+    parser.add_argument("--stand-in", metavar="PORT", type=int,
+                        help="run a local stand-in printer on PORT instead of sending")
+    parser.add_argument("--save-dir", help="with --stand-in, save what each connection received here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.stand_in is not None:
+        server = StandInPrinter("0.0.0.0", args.stand_in, args.save_dir)
+        log.info("Stand-in printer listening on port %d", server.server_address[1])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if not args.files or not args.printer:
+        parser.error("give files to send and at least one --printer")
+    dispatcher = PrintDispatcher()
+    try:
+        for printer in args.printer:
+            for path in args.files:
+                dispatcher.submit(printer, path)
+        dispatcher.wait()
+        stats = dispatcher.stats()
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        dispatcher.close()
+    for printer_stats in stats:
+        print(format_stats(printer_stats))
+    return 0 if all(s["jobs_failed"] == 0 for s in stats) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
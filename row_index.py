@@ -0,0 +1,265 @@
+import csv
+import hashlib
+import json
+import os
+import numpy as np
+from label_renderer import LABELS_PER_PAGE, render_placements
+from label_sources import DEFAULT_COLUMN, parse_qty
+
+# On-disk index for random access into large CSV / JSONL inputs.
+#
+# Built once per input file into "<input>.idx/" and memory-mapped afterwards:
+#   offsets.npy  byte offset of every data row, plus the end of the last row
+#   slots.npy    first label slot of every row (running total of qty), plus the total
+#   hashes.npy   64-bit hash of every row's code, sorted
+#   rows.npy     row number for each entry of hashes.npy
+#   meta.json    size/mtime of the input it was built from, and the columns
+# The index is rebuilt automatically when the input file changes.
+#
+# Rows are expected one per line (no quoted newlines inside a CSV field),
+# which holds for code exports.
+
+INDEX_VERSION = 2
+indexed_extensions = (".csv", ".jsonl")
+
+
+def code_hash(code):
+    return int.from_bytes(hashlib.blake2b(code.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _index_dir(path):
+    return f"{path}.idx"
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _line_parser(path, header_line, column, qty_column=None):
+    """
+    Returns a function that extracts (code, qty) from one raw data line.
+    """
+    if path.lower().endswith(".jsonl"):
+        def parse(line):
+            record = json.loads(line)
+            return str(record[column]), parse_qty(record.get(qty_column)) if qty_column else 1
+        return parse
+
+    header = next(csv.reader([header_line.decode("utf-8-sig")]))
+    if column not in header:
+        raise ValueError(f"Input must contain a '{column}' column.")
+    position = header.index(column)
+    qty_position = header.index(qty_column) if qty_column in header else None
+
+    def parse(line):
+        fields = next(csv.reader([line.decode("utf-8")]))
+        return fields[position], parse_qty(fields[qty_position]) if qty_position is not None else 1
+    return parse
+
+
+def _read_header(f, path):
+    return f.readline() if path.lower().endswith(".csv") else b""
+
+
+def build_index(path, column=DEFAULT_COLUMN, qty_column=None):
+    """
+    Scans the input once and writes its index next to it.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in indexed_extensions:
+        raise ValueError(f"Row index supports {', '.join(indexed_extensions)} inputs, not '{ext}'.")
+
+    stamp = _source_stamp(path)
+    offsets = []
+    slots = [0]
+    hashes = []
+    with open(path, "rb") as f:
+        header_line = _read_header(f, path)
+        parse = _line_parser(path, header_line, column, qty_column)
+        position = len(header_line)
+        for line in f:
+            # Blank lines are skipped by the readers too, so they get no row number
+            if line.strip():
+                code, qty = parse(line.rstrip(b"\r\n"))
+                offsets.append(position)
+                slots.append(slots[-1] + qty)
+                hashes.append(code_hash(code))
+            position += len(line)
+        offsets.append(position)
+
+    hashes = np.array(hashes, dtype=np.uint64)
+    order = np.argsort(hashes, kind="stable")
+
+    index_dir = _index_dir(path)
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "offsets.npy"), np.array(offsets, dtype=np.uint64))
+    np.save(os.path.join(index_dir, "slots.npy"), np.array(slots, dtype=np.uint64))
+    np.save(os.path.join(index_dir, "hashes.npy"), hashes[order])
+    np.save(os.path.join(index_dir, "rows.npy"), order.astype(np.uint64))
+    # meta.json goes last: its presence marks a complete index
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(stamp, column=column, qty_column=qty_column, rows=len(offsets) - 1, version=INDEX_VERSION), f)
+
+
+class RowIndex:
+    """
+    Random access to the rows of one input file through its memory-mapped index.
+    """
+
+    def __init__(self, path, column=DEFAULT_COLUMN, qty_column=None):
+        self.path = path
+        self.column = column
+        self.qty_column = qty_column
+        index_dir = _index_dir(path)
+        if not self._is_current(index_dir):
+            build_index(path, column, qty_column)
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+        self.slot_starts = np.load(os.path.join(index_dir, "slots.npy"), mmap_mode="r")
+        self.hashes = np.load(os.path.join(index_dir, "hashes.npy"), mmap_mode="r")
+        self.row_numbers = np.load(os.path.join(index_dir, "rows.npy"), mmap_mode="r")
+        with open(path, "rb") as f:
+            self._parse = _line_parser(path, _read_header(f, path), column, qty_column)
+
+    def _is_current(self, index_dir):
+        try:
+            with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return (meta.get("version") == INDEX_VERSION and meta.get("column") == self.column
+                and meta.get("qty_column") == self.qty_column
+                and all(meta.get(key) == value for key, value in _source_stamp(self.path).items()))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def codes(self, start, stop):
+        """
+        Returns the codes of rows start..stop-1 (0-based), reading only those bytes.
+        """
+        start = max(0, start)
+        stop = min(len(self), stop)
+        if start >= stop:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(int(self.offsets[start]))
+            chunk = f.read(int(self.offsets[stop]) - int(self.offsets[start]))
+        return [self._parse(line.rstrip(b"\r"))[0] for line in chunk.split(b"\n") if line.strip()]
+
+    def find_code(self, code):
+        """
+        Returns the 0-based row numbers holding `code`, in file order.
+        """
+        key = np.uint64(code_hash(code))
+        left = np.searchsorted(self.hashes, key, side="left")
+        right = np.searchsorted(self.hashes, key, side="right")
+        # Confirm each candidate, since different codes can share a 64-bit hash
+        candidates = sorted(int(row) for row in self.row_numbers[left:right])
+        return [row for row in candidates if self.codes(row, row + 1) == [code]]
+
+    def row_slots(self, row, copies=1):
+        """
+        Returns the [first, last) label slots a row fills across the whole job.
+        """
+        return int(self.slot_starts[row]) * copies, int(self.slot_starts[row + 1]) * copies
+
+    def row_at_slot(self, slot, copies=1):
+        return int(np.searchsorted(self.slot_starts, slot // copies, side="right")) - 1
+
+    def total_slots(self, copies=1):
+        return int(self.slot_starts[-1]) * copies
+
+
+def parse_ranges(text):
+    """
+    Parses "8413-8420, 8500" into [(8413, 8420), (8500, 8500)] (inclusive, as typed).
+    """
+    ranges = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        first, _, last = item.partition("-")
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"Invalid range '{item}'; use e.g. 8413-8420.")
+        # Numbers are 1-based as shown to operators; 0 or a reversed range is a typo
+        if not 1 <= first <= last:
+            raise ValueError(f"Invalid range '{item}'; numbers start at 1 and the first must not exceed the last.")
+        ranges.append((first, last))
+    return ranges
+
+
+def reprint_slots(path, column=DEFAULT_COLUMN, qty_column=None, copies=1, pages=None, rows=None, codes=None):
+    """
+    Collects the labels to reprint, selected by page numbers, row numbers
+    and/or codes (pages and rows are 1-based and inclusive, as shown to
+    operators). A row with a quantity fills several slots, all reprinted.
+
+    Returns:
+        list: Sorted (slot, code) pairs, slot counted from the first label of the job.
+    """
+    index = RowIndex(path, column, qty_column)
+    total = index.total_slots(copies)
+    wanted = {}  # row -> list of [first, last) slot ranges
+
+    for first, last in pages or []:
+        start, stop = (first - 1) * LABELS_PER_PAGE, min(last * LABELS_PER_PAGE, total)
+        if start >= stop:
+            continue
+        for row in range(index.row_at_slot(start, copies), index.row_at_slot(stop - 1, copies) + 1):
+            row_start, row_stop = index.row_slots(row, copies)
+            if max(start, row_start) < min(stop, row_stop):
+                wanted.setdefault(row, []).append((max(start, row_start), min(stop, row_stop)))
+    for first, last in rows or []:
+        for row in range(first - 1, min(last, len(index))):
+            wanted.setdefault(row, []).append(index.row_slots(row, copies))
+    for code in codes or []:
+        found = index.find_code(code)
+        if not found:
+            raise ValueError(f"Code '{code}' is not in {os.path.basename(path)}.")
+        for row in found:
+            wanted.setdefault(row, []).append(index.row_slots(row, copies))
+
+    # Read contiguous runs of rows with one seek each
+    row_codes = {}
+    run = []
+    for row in sorted(wanted) + [None]:
+        if run and (row is None or row != run[-1] + 1):
+            row_codes.update(zip(run, index.codes(run[0], run[-1] + 1)))
+            run = []
+        if row is not None:
+            run.append(row)
+
+    selected = set()
+    for row, ranges in wanted.items():
+        for start, stop in ranges:
+            selected.update((slot, row_codes[row]) for slot in range(start, stop))
+    return sorted(selected)
+
+
+def reprint_pdf(path, output_path, column=DEFAULT_COLUMN, pages=None, rows=None, codes=None, qty_column=None,
+                keep=None, **settings):
+    """
+    Renders only the sheets holding the selected labels, each in its original
+    slot so the reprint lines up with the original stock.
+
+    Args:
+        keep (callable): Narrows the (page, slot, code) placements to what the
+            original job printed, e.g. PrintLedger.original_labels(path).
+
+    Returns:
+        int: Number of labels written.
+    """
+    copies = settings.pop("copies", 1)
+    selected = reprint_slots(path, column, qty_column, copies, pages, rows, codes)
+    if not selected:
+        raise ValueError("Nothing to reprint: the selection is outside the input.")
+    placements = [(slot // LABELS_PER_PAGE, slot % LABELS_PER_PAGE, code) for slot, code in selected]
+    if keep is not None:
+        placements = keep(placements)
+        if not placements:
+            raise ValueError("Nothing to reprint: the original job printed none of the selected labels.")
+    return render_placements(placements, output_path, **settings)
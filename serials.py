@@ -0,0 +1,122 @@
+import re
+from string import ascii_lowercase, ascii_uppercase
+from label_sources import DEFAULT_BATCH_SIZE, batched
+
+# A code is split into a fixed prefix and a trailing counter, which is either
+# a run of digits ("0042") or a run of letters ("DF"). The counter keeps its
+# width, so "0099" -> "0100" and "AZ" -> "BA".
+_COUNTER = re.compile(r"^(.*?)(\d+|[A-Z]+|[a-z]+)$")
+
+
+def split_counter(code):
+    match = _COUNTER.match(code)
+    if not match:
+        raise ValueError(f"'{code}' does not end in a number or letters to count with.")
+    return match.group(1), match.group(2)
+
+
+def _counter_alphabet(counter):
+    if counter.isdigit():
+        return "0123456789"
+    return ascii_uppercase if counter.isupper() else ascii_lowercase
+
+
+def _counter_to_int(counter, alphabet):
+    value = 0
+    for ch in counter:
+        value = value * len(alphabet) + alphabet.index(ch)
+    return value
+
+
+def _int_to_counter(value, width, alphabet):
+    base = len(alphabet)
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, base)
+        chars.append(alphabet[digit])
+    return "".join(reversed(chars))
+
+
+def expand_count(start, count, step=1):
+    """
+    Yields `count` codes beginning at `start`, advancing the trailing counter by `step`.
+    """
+    _check_step(step)
+    prefix, counter = split_counter(start)
+    alphabet = _counter_alphabet(counter)
+    width = len(counter)
+    first = _counter_to_int(counter, alphabet)
+    last = first + (count - 1) * step
+    if count > 0 and last >= len(alphabet) ** width:
+        raise ValueError(f"'{start}' + {count} codes overflows its {width}-character counter.")
+    for value in range(first, last + 1, step):
+        yield prefix + _int_to_counter(value, width, alphabet)
+
+
+def expand_range(start, end, step=1):
+    """
+    Yields every code from `start` to `end` inclusive, e.g. V13802DE..V13802DI.
+    """
+    _check_step(step)
+    start_prefix, start_counter = split_counter(start)
+    end_prefix, end_counter = split_counter(end)
+    alphabet = _counter_alphabet(start_counter)
+    if (start_prefix != end_prefix or len(start_counter) != len(end_counter)
+            or _counter_alphabet(end_counter) != alphabet):
+        raise ValueError(f"'{start}' and '{end}' are not part of the same serial range.")
+    first = _counter_to_int(start_counter, alphabet)
+    last = _counter_to_int(end_counter, alphabet)
+    if last < first:
+        raise ValueError(f"Range '{start}..{end}' runs backwards.")
+    return expand_count(start, (last - first) // step + 1, step)
+
+
+def expand_spec(spec):
+    """
+    Lazily expands a serial spec into codes.
+
+    The spec is a comma-separated list of items:
+        START..END      every code from START to END, e.g. 10359472DF..10359472DJ
+        START+COUNT     COUNT codes beginning at START, e.g. A000001+1000000
+        CODE            a single code
+    Ranges and counts take an optional ":STEP" suffix, e.g. A0001..A0100:5.
+    """
+    items = [item.strip() for item in spec.split(",") if item.strip()]
+    if not items:
+        raise ValueError("The serial spec is empty.")
+    for item in items:
+        step = 1
+        if ":" in item:
+            item, step_text = item.rsplit(":", 1)
+            step = _parse_int(step_text, "step")
+            _check_step(step)
+        if ".." in item:
+            start, end = item.split("..", 1)
+            yield from expand_range(start.strip(), end.strip(), step)
+        elif "+" in item:
+            start, count_text = item.rsplit("+", 1)
+            count = _parse_int(count_text, "count")
+            if count < 1:
+                raise ValueError(f"Count in '{item}' must be at least 1.")
+            yield from expand_count(start.strip(), count, step)
+        else:
+            yield item
+
+
+def _check_step(step):
+    if step < 1:
+        raise ValueError("Step must be at least 1.")
+
+
+def _parse_int(text, name):
+    try:
+        return int(text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid {name} '{text.strip()}' in serial spec.")
+
+
+def serial_code_batches(spec, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Same batched interface as label_sources.iter_code_batches, for a serial spec.
+    """
+    return batched(expand_spec(spec), batch_size)
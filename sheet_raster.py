@@ -0,0 +1,158 @@
+import os
+from functools import lru_cache
+from PIL import Image, ImageDraw, TiffImagePlugin
+from barcode_raster import render_barcode
+from label_renderer import (
+    IMAGE_CACHE_SIZE,
+    PADDING,
+    PAGE_HEIGHT,
+    PAGE_WIDTH,
+    barcode_options,
+    label_slots,
+    label_types,
+    sequential_placements,
+)
+
+# Raster counterpart of label_renderer.render_pdf: each sheet is composed
+# directly into one page bitmap using the same slot geometry, then written as
+# a PNG per page or as one multi-page TIFF. No PDF is involved.
+
+DEFAULT_DPI = 300
+image_formats = ("png", "tiff")
+# File extension -> image format
+image_extensions = {".png": "png", ".tif": "tiff", ".tiff": "tiff"}
+GUIDE_GRAY = 204  # Same light gray (0.8) as the PDF alignment guides
+
+
+def _px(points, dpi):
+    return int(round(points * dpi / 72.0))
+
+
+def label_boxes(label_type, dpi):
+    """
+    Returns (left, top, width, height) in pixels of the barcode area of every
+    label on a page, matching where render_pdf draws it.
+    """
+    label_w, label_h = label_types[label_type]
+    boxes = []
+    for x, y in label_slots(label_type):
+        # PDF coordinates start bottom-left, image coordinates top-left
+        left = _px(x + PADDING, dpi)
+        top = _px(PAGE_HEIGHT - (y + label_h - PADDING), dpi)
+        boxes.append((left, top, _px(label_w - 2 * PADDING, dpi), _px(label_h - 2 * PADDING, dpi)))
+    return boxes
+
+
+def sheet_template_image(label_type, dpi, show_guides=True):
+    """
+    Renders the static layer of a sheet once; every page starts as a copy of it.
+    """
+    page = Image.new("L", (_px(PAGE_WIDTH, dpi), _px(PAGE_HEIGHT, dpi)), 255)
+    if show_guides:
+        label_w, label_h = label_types[label_type]
+        draw = ImageDraw.Draw(page)
+        for x, y in label_slots(label_type):
+            left, top = _px(x, dpi), _px(PAGE_HEIGHT - y - label_h, dpi)
+            draw.rectangle(
+                [left, top, left + _px(label_w, dpi), top + _px(label_h, dpi)],
+                outline=GUIDE_GRAY,
+                width=max(1, _px(0.25, dpi)),
+            )
+    return page
+
+
+def page_image_path(output_path, page_number):
+    """
+    Path of one page when writing PNGs, e.g. avery_labels.png -> avery_labels_p0001.png.
+    """
+    stem = os.path.splitext(output_path)[0]
+    return f"{stem}_p{page_number:04d}.png"
+
+
+class PageWriter:
+    """
+    Writes finished page bitmaps as numbered PNGs or appends them to one TIFF.
+    """
+
+    def __init__(self, output_path, image_format, dpi):
+        if image_format not in image_formats:
+            raise ValueError(f"Unsupported image format '{image_format}'. Use one of: {', '.join(image_formats)}")
+        self.output_path = output_path
+        self.image_format = image_format
+        self.dpi = dpi
+        self.pages = 0
+        self._tiff = TiffImagePlugin.AppendingTiffWriter(output_path, new=True) if image_format == "tiff" else None
+
+    def write(self, page):
+        self.pages += 1
+        if self._tiff is None:
+            page.save(page_image_path(self.output_path, self.pages), "PNG", dpi=(self.dpi, self.dpi))
+        else:
+            page.save(self._tiff, "TIFF", dpi=(self.dpi, self.dpi), compression="tiff_deflate")
+            self._tiff.newFrame()
+
+    def close(self):
+        if self._tiff is not None:
+            self._tiff.close()
+
+
+def render_sheets(code_batches, output_path, label_type="Avery 5160", font_size=14, show_text=True,
+                  show_guides=True, copies=1, dpi=DEFAULT_DPI, image_format=None, text_layer=True,
+                  on_page=None):
+    """
+    Lays out barcodes on label sheets and writes each sheet as an image.
+
+    Args:
+        code_batches (iterable): Lists of code strings, e.g. from label_sources.iter_code_batches.
+        output_path (str): A .tiff file, or the base name for numbered .png pages.
+        label_type, font_size, show_text, show_guides, copies, on_page: As for render_pdf.
+        dpi (int): Resolution of the page images.
+        image_format (str): "png" or "tiff"; taken from output_path's extension if omitted.
+        text_layer (bool): Accepted for symmetry with render_pdf; image pages
+            always carry the text as pixels.
+
+    Returns:
+        int: Number of labels written.
+    """
+    image_format = image_format or image_extensions.get(os.path.splitext(output_path)[1].lower())
+    writer = PageWriter(output_path, image_format, dpi)
+    boxes = label_boxes(label_type, dpi)
+    options = barcode_options(font_size, show_text)
+
+    # One page buffer for the whole job, reset from the template between pages
+    template = sheet_template_image(label_type, dpi, show_guides)
+    page = template.copy()
+
+    # Every slot has the same size, so a stretched image can be reused in any
+    # slot; repeats of a code are rendered once
+    _, _, width, height = boxes[0]
+
+    @lru_cache(maxsize=IMAGE_CACHE_SIZE)
+    def barcode_image_for(code):
+        # Stretch to the label like drawImage does; nearest keeps bar edges sharp
+        return render_barcode(code, options).convert("L").resize((width, height), Image.NEAREST)
+
+    count = 0
+    current_page = None
+    page_labels = []
+    try:
+        for page_number, slot, barcode_data in sequential_placements(code_batches, copies):
+            if page_number != current_page:
+                if current_page is not None:
+                    writer.write(page)
+                    page.paste(template)
+                    if on_page is not None:
+                        on_page(current_page, page_labels)
+                    page_labels = []
+                current_page = page_number
+            left, top = boxes[slot][:2]
+            page.paste(barcode_image_for(barcode_data), (left, top))
+            page_labels.append((slot, barcode_data))
+            count += 1
+        if current_page is not None:
+            writer.write(page)
+            if on_page is not None:
+                on_page(current_page, page_labels)
+    finally:
+        writer.close()
+    return count
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from label_renderer import LABELS_PER_PAGE, sequential_placements
+from print_ledger import RESERVATION_TIMEOUT, PrintLedger, preflight
+
+# Checks the print ledger's duplicate handling:
+#   python -m pytest test_print_ledger.py   (or python -m unittest test_print_ledger)
+
+
+def _batches(codes):
+    return lambda: [list(codes)]
+
+
+class PrintLedgerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ledger.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _print(self, codes):
+        with PrintLedger(self.path) as ledger, ledger.job("earlier", {}) as job:
+            make_batches, _ = preflight(ledger, job, _batches(codes), "abort")
+            for page, slot, code in sequential_placements(make_batches()):
+                job.record_page(page, [(slot, code)])
+
+    def test_running_job_reserves_its_codes(self):
+        with PrintLedger(self.path) as first, PrintLedger(self.path) as second:
+            with self.assertRaises(RuntimeError):
+                with first.job("a.csv", {}) as job:
+                    preflight(first, job, _batches(["A1", "A2"]), "abort")
+                    with second.job("b.csv", {}) as other:
+                        with self.assertRaisesRegex(ValueError, "1 codes were already printed or are being printed"):
+                            preflight(second, other, _batches(["A2", "B1"]), "abort")
+                    raise RuntimeError("render failed")
+            # The failed job printed nothing and no longer holds its codes
+            with second.job("b.csv", {}) as other:
+                _, printed = preflight(second, other, _batches(["A2", "B1"]), "abort")
+            self.assertEqual(printed, {})
+
+    def test_reservations_of_a_dead_job_lapse(self):
+        with PrintLedger(self.path) as first, PrintLedger(self.path) as second:
+            # A job whose process was killed: reserved, then silent
+            cursor = first.conn.execute(
+                "INSERT INTO jobs (job_id, kind, source, settings, started_at, heartbeat_at) "
+                "VALUES ('dead', 'print', 'killed.csv', '{}', '2026-01-01 00:00:00', ?)",
+                (time.time() - RESERVATION_TIMEOUT - 1,),
+            )
+            first.conn.execute("INSERT INTO reserved (code, job) VALUES ('K1', ?)", (cursor.lastrowid,))
+            with second.job("again.csv", {}) as job:
+                _, printed = preflight(second, job, _batches(["K1"]), "abort")
+            self.assertEqual(printed, {})
+
+    def test_concurrent_preflights_with_overlapping_codes(self):
+        barrier = threading.Barrier(2)
+        started = threading.Barrier(3)
+        finish = threading.Event()
+        outcomes = []
+
+        def worker(codes):
+            with PrintLedger(self.path) as ledger, ledger.job("hot folder", {}) as job:
+                barrier.wait()
+                try:
+                    preflight(ledger, job, _batches(codes), "abort")
+                    outcomes.append("passed")
+                except ValueError:
+                    outcomes.append("refused")
+                started.wait()
+                finish.wait(5)  # Hold the job open until both have checked
+
+        PrintLedger(self.path).close()  # Create the schema up front
+        threads = [threading.Thread(target=worker, args=(codes,)) for codes in (["X1", "X2"], ["X2", "X3"])]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        finish.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sorted(outcomes), ["passed", "refused"])
+
+    def test_skip_leaves_slots_empty(self):
+        second_page = [f"P{n}" for n in range(LABELS_PER_PAGE)]
+        self._print(["B"] + second_page)
+        first_page = ["A", "B"] + [f"F{n}" for n in range(LABELS_PER_PAGE - 2)]
+        with PrintLedger(self.path) as ledger, ledger.job("again", {}) as job:
+            make_batches, printed = preflight(ledger, job, _batches(first_page + second_page + ["Z"]), "skip")
+        self.assertEqual(set(printed), {"B"} | set(second_page))
+        # B's slot stays empty, the all-skipped second page is left out, and Z
+        # keeps its slot on the third page
+        placements = list(sequential_placements(make_batches()))
+        self.assertEqual(placements[:2], [(0, 0, "A"), (0, 2, "F0")])
+        self.assertEqual(placements[-1], (2, 0, "Z"))
+        self.assertEqual(len(placements), LABELS_PER_PAGE)
+
+    def test_reprint_keeps_skipped_slots_empty(self):
+        self._print(["B"])
+        with PrintLedger(self.path) as ledger:
+            with ledger.job("s.csv", {}) as job:
+                make_batches, _ = preflight(ledger, job, _batches(["A", "B", "C"]), "skip")
+                for page, slot, code in sequential_placements(make_batches()):
+                    job.record_page(page, [(slot, code)])
+            keep = ledger.original_labels("s.csv")
+            self.assertEqual(keep([(0, 0, "A"), (0, 1, "B"), (0, 2, "C")]), [(0, 0, "A"), (0, 2, "C")])
+            self.assertIsNone(ledger.original_labels("other.csv"))
+
+    def test_skip_with_everything_printed(self):
+        self._print(["A", "B"])
+        with PrintLedger(self.path) as ledger, ledger.job("again", {}) as job:
+            with self.assertRaisesRegex(ValueError, "All 2 codes were already printed"):
+                preflight(ledger, job, _batches(["B", "A"]), "skip")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from raw_print import BLOCK_SIZE, PrintDispatcher, StandInPrinter
+
+# Checks raw-socket dispatch against the local stand-in printer:
+#   python -m pytest test_raw_print.py   (or python -m unittest test_raw_print)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the stand-in printer")
+        time.sleep(0.02)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RawPrintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = PrintDispatcher(backoff=0.05)
+        self.servers = []
+
+    def tearDown(self):
+        self.dispatcher.close()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def _stand_in(self, port=0):
+        server = StandInPrinter(port=port).start()
+        self.servers.append(server)
+        return server
+
+    def test_each_part_arrives_byte_identical_as_its_own_job(self):
+        server = self._stand_in()
+        parts = [os.urandom(size) for size in (BLOCK_SIZE * 3 + 17, 1, BLOCK_SIZE)]
+        with tempfile.TemporaryDirectory() as tmp:
+            for number, data in enumerate(parts, start=1):
+                path = os.path.join(tmp, f"labels_c{number:04d}.pdf")
+                with open(path, "wb") as f:
+                    f.write(data)
+                self.dispatcher.submit(server.address, path)
+            self.dispatcher.wait()
+        stats = self.dispatcher.stats()[0]
+
+        # One connection per part: the close is the job boundary the printer sees
+        _wait_for(lambda: len(server.received()) == sum(map(len, parts)))
+        self.assertEqual([bytes(data) for data in server.connections], parts)
+        self.assertEqual((stats["jobs_sent"], stats["jobs_failed"], stats["queue_depth"]), (3, 0, 0))
+        self.assertEqual(stats["bytes_sent"], sum(map(len, parts)))
+
+    def test_printer_that_comes_up_late_is_reached_after_retries(self):
+        port = _free_port()
+        starter = threading.Timer(0.3, lambda: self._stand_in(port))
+        starter.start()
+        self.dispatcher.submit(("127.0.0.1", port), b"late job")
+        self.dispatcher.wait()
+        starter.join()
+        stats = self.dispatcher.stats()[0]
+        self.dispatcher.close()
+
+        server = self.servers[0]
+        _wait_for(lambda: server.received() == b"late job")
+        self.assertEqual(stats["jobs_sent"], 1)
+        self.assertGreaterEqual(stats["retries"], 1)
+
+    def test_job_cut_off_part_way_is_not_resent(self):
+        # A printer that takes the first block of a job, then resets the connection
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        accepted = []
+
+        def serve():
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    return
+                accepted.append(conn.recv(BLOCK_SIZE))
+                conn.close()
+
+        threading.Thread(target=serve, daemon=True).start()
+        self.dispatcher.submit(listener.getsockname(), b"A" * (64 << 20))
+        self.dispatcher.wait()
+        listener.close()
+
+        stats = self.dispatcher.stats()[0]
+        self.assertEqual((stats["jobs_sent"], stats["jobs_failed"], stats["retries"]), (0, 1, 0))
+        self.assertEqual(len(accepted), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()